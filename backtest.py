@@ -0,0 +1,479 @@
+import argparse
+import heapq
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from indicators import ema_series, rsi_series, adx_series, macd_series
+from scheduler import CLOSE_DELAY, active_tickers, is_open
+
+# ---------------------------------------------------------
+# 1. PARÀMETRES (mateixos valors que els bots)
+# ---------------------------------------------------------
+DEFAULT_PARAMS = {
+    'TARGET_NET_PROFIT': 0.0085,
+    'STOP_LOSS_PCT': 0.0085,
+    'LEVERAGE': 5,
+    'COMMISSION_RATE': 0.001,
+    'ALLOCATION_PCT': 0.10,
+    'MAX_POSITIONS': 10,        # None: sense límit
+    'INITIAL_CAPITAL': 10000.0,
+    # Balanced (bot_proves.py)
+    'EMA_FAST': 50,
+    'RSI_LENGTH': 14,
+    'ADX_LENGTH': 14,
+    'ADX_MIN': 20,
+    # Sniper (bot_test.py)
+    'EMA_SLOW': 200,
+    'MACD_FAST': 12,
+    'MACD_SLOW': 26,
+    'MACD_SIGNAL': 9,
+}
+
+# ---------------------------------------------------------
+# 2. SENYALS D'ENTRADA VECTORITZATS
+# ---------------------------------------------------------
+# Cada funció rep les espelmes d'un ticker (ja sense NaN) i retorna un array
+# booleà: True on el bot entraria amb curr = espelma i, prev = espelma i-1.
+# Com al bot, cal que prev i curr tinguin tots els indicadors calculats.
+
+def _both_valid(*series):
+    valid = np.logical_and.reduce([s.notna().values for s in series])
+    prev_valid = np.concatenate([[False], valid[:-1]])
+    return valid & prev_valid
+
+def _memo(cache):
+    # cache: dict per ticker {(funció, longituds): sèrie}. Diversos jocs de
+    # paràmetres que comparteixen longitud reutilitzen la mateixa sèrie.
+    def ind(fn, *args):
+        if cache is None:
+            return fn(*args)
+        key = (fn.__name__,) + tuple(a for a in args if not isinstance(a, pd.Series))
+        if key not in cache:
+            cache[key] = fn(*args)
+        return cache[key]
+    return ind
+
+def balanced_signals(df, p, cache=None):
+    ind = _memo(cache)
+    close = df['Close']
+    ema = ind(ema_series, close, p['EMA_FAST'])
+    rsi = ind(rsi_series, close, p['RSI_LENGTH'])
+    adx = ind(adx_series, df['High'], df['Low'], close, p['ADX_LENGTH'])
+    prev_rsi = rsi.shift(1)
+
+    trend_ok = close > ema
+    rsi_rising = (prev_rsi < 50) & (rsi > 50)
+    not_overbought = rsi < 70
+    adx_ok = adx > p['ADX_MIN']
+    return (trend_ok & rsi_rising & not_overbought & adx_ok).values & _both_valid(ema, rsi, adx)
+
+def sniper_signals(df, p, cache=None):
+    ind = _memo(cache)
+    close = df['Close']
+    ema = ind(ema_series, close, p['EMA_SLOW'])
+    macd, sig = ind(macd_series, close, p['MACD_FAST'], p['MACD_SLOW'], p['MACD_SIGNAL'])
+
+    trend_ok = close > ema
+    pullback_ok = macd < 0
+    crossover = (macd.shift(1) < sig.shift(1)) & (macd > sig)
+    return (trend_ok & pullback_ok & crossover).values & _both_valid(ema, macd, sig)
+
+STRATEGIES = {
+    'balanced': balanced_signals,
+    'sniper': sniper_signals,
+}
+
+# Força del senyal (com Strategy.strength): ordre dels candidats d'una mateixa espelma
+def balanced_strength(df, p, cache=None):
+    ind = _memo(cache)
+    return ind(adx_series, df['High'], df['Low'], df['Close'], p['ADX_LENGTH']).values
+
+def sniper_strength(df, p, cache=None):
+    ind = _memo(cache)
+    macd, sig = ind(macd_series, df['Close'], p['MACD_FAST'], p['MACD_SLOW'], p['MACD_SIGNAL'])
+    return ((macd - sig) / df['Close']).values
+
+STRENGTH = {
+    'balanced': balanced_strength,
+    'sniper': sniper_strength,
+}
+
+# ---------------------------------------------------------
+# 3. PANELL ESPELMES x TICKERS
+# ---------------------------------------------------------
+FIELDS = ('Open', 'High', 'Low', 'Close')
+MINUTE = 60 * 10 ** 9       # ns
+
+def build_panel(frames, strategy, params, caches=None):
+    # prices: FIELDS x tickers x espelmes, NaN on el ticker no té espelma
+    caches = {} if caches is None else caches
+    tickers = list(frames)
+    index = frames[tickers[0]].index
+    for ticker in tickers[1:]:
+        index = index.union(frames[ticker].index)
+
+    prices = np.full((len(FIELDS), len(tickers), len(index)), np.nan)
+    for j, ticker in enumerate(tickers):
+        df = frames[ticker].dropna()
+        pos = index.get_indexer(df.index)
+        for f, field in enumerate(FIELDS):
+            prices[f, j, pos] = df[field].values
+    signal = signal_panel(frames, index, strategy, params, caches)
+    strength = strength_panel(frames, index, strategy, params, caches)
+    return index, tickers, prices, signal, strength
+
+def signal_panel(frames, index, strategy, params, caches=None):
+    # caches: {ticker: {}} opcional per reutilitzar indicadors entre crides
+    signal = np.zeros((len(frames), len(index)), dtype=bool)
+    for j, ticker in enumerate(frames):
+        df = frames[ticker].dropna()
+        cache = caches.setdefault(ticker, {}) if caches is not None else None
+        signal[j, index.get_indexer(df.index)] = STRATEGIES[strategy](df, params, cache)
+    return signal
+
+def strength_panel(frames, index, strategy, params, caches=None):
+    strength = np.full((len(frames), len(index)), np.nan)
+    for j, ticker in enumerate(frames):
+        df = frames[ticker].dropna()
+        cache = caches.setdefault(ticker, {}) if caches is not None else None
+        strength[j, index.get_indexer(df.index)] = STRENGTH[strategy](df, params, cache)
+    return strength
+
+def net_pnl_pct(invested, entry_price, price, p):
+    # Mateixa fórmula (i mateix ordre d'operacions) que els bots
+    gross_value = (invested * p['LEVERAGE'] / entry_price) * price
+    lev_invested = invested * p['LEVERAGE']
+    net_pnl = (gross_value - lev_invested) - (lev_invested * p['COMMISSION_RATE'])
+    return net_pnl, net_pnl / invested
+
+def exit_levels(entry_price, p):
+    # Preus de l'stop i de l'objectiu, igual que ExitMonitor.levels
+    k = p['LEVERAGE']
+    stop_price = entry_price * (1 + (k * p['COMMISSION_RATE'] - p['STOP_LOSS_PCT']) / k)
+    target_price = entry_price * (1 + (k * p['COMMISSION_RATE'] + p['TARGET_NET_PROFIT']) / k)
+    return stop_price, target_price
+
+def _stamps(index):
+    # ns des de l'època (UTC); un índex sense zona es pren com a UTC
+    return index.as_unit('ns').asi8
+
+def _cycle_time(minute):
+    # Hora del cicle que tracta l'espelma del minut `minute` (tancament + marge)
+    return pd.Timestamp(minute + MINUTE, unit='ns', tz='UTC') + pd.Timedelta(seconds=CLOSE_DELAY)
+
+def _watched(ticker, minute):
+    # El motor vigila el ticker al cicle del minut `minute` (mercat obert o acabat de tancar)
+    return bool(active_tickers([ticker], _cycle_time(minute)))
+
+def find_exit(bars, k, entry_price, invested, p, ticker=None):
+    # Primera sortida d'una posició oberta a l'espelma k d'un ticker, com en viu:
+    #  - obertura d'una espelma (vista en formació al cicle del minut anterior)
+    #    més enllà d'un nivell -> surt a l'Open;
+    #  - espelma posterior a l'entrada que toca un nivell -> surt al nivell
+    #    (o a l'Open si ja l'havia passat; si toca els dos, l'stop);
+    #  - tancament més enllà d'un nivell (cicle complet).
+    # bars: (minuts en ns, Open, High, Low, Close) del ticker.
+    # Retorna (minut del cicle que la veu, preu, 'level' | 'close') o None.
+    # Busquem per blocs creixents per no recórrer tot l'històric per cada trade.
+    ts, o, h, l, c = bars
+    stop_price, target_price = exit_levels(entry_price, p)
+    start, width = k + 1, 256
+    while start < len(ts):
+        sl = slice(start, start + width)
+        # L'obertura només es veu abans si la posició ja era oberta al cicle anterior
+        gap = ((o[sl] <= stop_price) | (o[sl] >= target_price)) & (ts[sl] - ts[k] >= 2 * MINUTE)
+        low, high = l[sl] <= stop_price, h[sl] >= target_price
+        _, pct = net_pnl_pct(invested, entry_price, c[sl], p)
+        closing = (pct >= p['TARGET_NET_PROFIT']) | (pct <= -p['STOP_LOSS_PCT'])
+        for i in np.flatnonzero(gap | low | high | closing):
+            kk = start + i
+            if gap[i] and (ticker is None or _watched(ticker, ts[kk] - MINUTE)):
+                return ts[kk] - MINUTE, o[kk], 'level'
+            if low[i]:
+                return ts[kk], min(stop_price, o[kk]), 'level'
+            if high[i]:
+                return ts[kk], max(target_price, o[kk]), 'level'
+            return ts[kk], c[kk], 'close'
+        start += width
+        width *= 4
+    return None
+
+# ---------------------------------------------------------
+# 4. MOTOR DE BACKTEST
+# ---------------------------------------------------------
+# Els senyals i les sortides es calculen vectoritzats. Només les espelmes amb
+# algun esdeveniment (senyal o sortida) passen pel bucle de caixa, que aplica
+# la mateixa comptabilitat que el motor en viu amb el cicle alineat:
+#  - al cicle de l'espelma t, primer les sortides (vigilància dins
+#    l'espelma, find_exit) i després les entrades al Close de t;
+#  - només s'entra si el mercat del ticker és obert a l'hora del cicle
+#    (l'última espelma de la sessió es tracta amb la sessió ja tancada);
+#  - candidats de més a menys força (a igual força, en l'ordre de TICKERS);
+#    mida = equity del cicle (minut) anterior * ALLOCATION_PCT, i s'entra
+#    mentre hi hagi balance >= mida i menys de MAX_POSITIONS obertes;
+#  - una sortida vista en un minut sense cap espelma es compta abans del
+#    cicle següent; un ticker que surt pel tancament no torna a entrar en
+#    el mateix cicle, un que surt dins l'espelma sí.
+
+def run_backtest(frames, strategy='balanced', params=None):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    index, tickers, prices, signal, strength = build_panel(frames, strategy, p)
+    return simulate(index, tickers, prices, signal, p, strength)
+
+def simulate(index, tickers, prices, signal, p, strength=None):
+    n_bars = len(index)
+    close = prices[FIELDS.index('Close')]
+    # Últim preu conegut: el motor valora amb l'última espelma de cada ticker
+    last = pd.DataFrame(close.T).ffill().values.T
+    stamps = _stamps(index)
+    initial = p['INITIAL_CAPITAL']
+
+    balance = initial
+    open_pos = {}   # j -> [entry_bar, entry_price, invested]
+    exits = []      # heap (espelma del cicle, 0 abans / 1 dins el cicle, ordre, j, preu, minut, tipus)
+    trades, spans = [], []
+    bars = {}       # j -> (posicions a l'índex, minuts, Open, High, Low, Close)
+    candidates = np.flatnonzero(signal.any(axis=0))
+    ci, seq = 0, 0
+    snap = None     # (t, balance, posicions) després de les sortides del cicle t
+
+    def equity_at(t, balance_start, positions):
+        equity = balance_start
+        for j, (_, entry_price, invested) in positions.items():
+            net_pnl, _ = net_pnl_pct(invested, entry_price, last[j, t], p)
+            equity += invested + net_pnl
+        return equity
+
+    def close_position(j, price, minute, kind, t):
+        nonlocal balance
+        entry_bar, entry_price, invested = open_pos.pop(j)
+        net_pnl, pct = net_pnl_pct(invested, entry_price, price, p)
+        balance += invested + net_pnl
+        # Pel tancament: guanya si arriba a l'objectiu; dins l'espelma: si surt per sobre de l'entrada
+        win = pct >= p['TARGET_NET_PROFIT'] if kind == 'close' else price > entry_price
+        exit_time = pd.Timestamp(minute, unit='ns', tz='UTC')
+        trades.append({
+            'Ticker': tickers[j], 'Entry': index[entry_bar],
+            'Exit': exit_time.tz_convert(index.tz) if index.tz is not None else exit_time.tz_localize(None),
+            'EntryPrice': entry_price, 'ExitPrice': price, 'Invested': invested,
+            'PL': net_pnl, 'PL_pct': pct, 'Res': 'WIN' if win else 'LOSS',
+        })
+        spans.append((j, entry_bar, t, entry_price, invested, net_pnl))
+
+    while ci < len(candidates) or exits:
+        t = min(candidates[ci] if ci < len(candidates) else n_bars,
+                exits[0][0] if exits else n_bars)
+        entering = ci < len(candidates) and candidates[ci] == t
+        if entering:
+            ci += 1
+
+        # Sortides vistes en minuts sense espelmes, abans d'aquest cicle
+        while exits and exits[0][0] == t and exits[0][1] == 0:
+            _, _, _, j, price, minute, kind = heapq.heappop(exits)
+            close_position(j, price, minute, kind, t)
+
+        # Equity del cicle (minut) anterior: el que fa servir el motor per la mida
+        if t == 0:
+            equity_prev = initial
+        elif stamps[t] - stamps[t - 1] == MINUTE and snap is not None and snap[0] == t - 1:
+            equity_prev = equity_at(t - 1, snap[1], snap[2])
+        else:
+            equity_prev = equity_at(t - 1, balance, open_pos)
+
+        closed_now = set()
+        while exits and exits[0][0] == t:
+            _, _, _, j, price, minute, kind = heapq.heappop(exits)
+            close_position(j, price, minute, kind, t)
+            if kind == 'close':
+                closed_now.add(j)
+        snap = (t, balance, dict(open_pos))
+        if not entering:
+            continue
+
+        trade_size = equity_prev * p['ALLOCATION_PCT']
+        order = np.flatnonzero(signal[:, t])
+        if strength is not None and len(order) > 1:
+            score = np.nan_to_num(strength[order, t], nan=-np.inf)
+            order = order[np.argsort(-score, kind='stable')]
+        for j in order.tolist():
+            if j in open_pos or j in closed_now or not is_open(tickers[j], _cycle_time(stamps[t])):
+                continue
+            if p.get('MAX_POSITIONS') is not None and len(open_pos) >= p['MAX_POSITIONS']:
+                break
+            if balance < trade_size:
+                break
+            entry_price = close[j, t]
+            open_pos[j] = [t, entry_price, trade_size]
+            balance -= trade_size
+            if j not in bars:
+                pos = np.flatnonzero(~np.isnan(close[j]))
+                bars[j] = (pos, stamps[pos]) + tuple(prices[f, j, pos] for f in range(len(FIELDS)))
+            pos, *series = bars[j]
+            hit = find_exit(series, int(np.searchsorted(pos, t)), entry_price, trade_size, p, tickers[j])
+            if hit is not None:
+                minute, price, kind = hit
+                slot = int(np.searchsorted(stamps, minute))
+                heapq.heappush(exits, (slot, 0 if stamps[slot] > minute else 1, seq, j, price, minute, kind))
+                seq += 1
+
+    equity = equity_curve(n_bars, last, spans, open_pos, p)
+    return {
+        'trades': pd.DataFrame(trades, columns=['Ticker', 'Entry', 'Exit', 'EntryPrice', 'ExitPrice',
+                                                'Invested', 'PL', 'PL_pct', 'Res']),
+        'equity': pd.Series(equity, index=index, name='Equity'),
+        'balance': balance,
+        'open': {tickers[j]: v for j, v in open_pos.items()},
+    }
+
+def equity_curve(n_bars, last, spans, open_pos, p):
+    # equity[t] = el que el motor desa com a equity al cicle t: caixa després
+    # de les sortides del cicle (abans de les entrades) + posicions obertes
+    # valorades a l'últim tancament
+    entered = np.zeros(n_bars)
+    exited = np.zeros(n_bars)
+    value = np.zeros(n_bars)
+    spans = spans + [(j, v[0], None, v[1], v[2], None) for j, v in open_pos.items()]
+
+    for j, entry_bar, exit_bar, entry_price, invested, pl in spans:
+        entered[entry_bar] -= invested
+        end = n_bars if exit_bar is None else exit_bar
+        if exit_bar is not None:
+            exited[exit_bar] += invested + pl
+        net_pnl, _ = net_pnl_pct(invested, entry_price, last[j, entry_bar + 1:end], p)
+        value[entry_bar + 1:end] += invested + net_pnl
+
+    balance = p['INITIAL_CAPITAL'] + np.cumsum(exited) + np.concatenate([[0.0], np.cumsum(entered)[:-1]])
+    return balance + value
+
+def summarize(result, params=None):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    trades = result['trades']
+    equity = result['equity']
+    wins = int((trades['Res'] == 'WIN').sum())
+    total = len(trades)
+    peak = np.maximum.accumulate(equity.values) if len(equity) else np.array([p['INITIAL_CAPITAL']])
+    drawdown = ((equity.values - peak) / peak).min() if len(equity) else 0.0
+    final = float(equity.iloc[-1]) if len(equity) else p['INITIAL_CAPITAL']
+    return {
+        'net_pnl': final - p['INITIAL_CAPITAL'],
+        'win_rate': wins / total if total else 0.0,
+        'max_drawdown': float(drawdown),
+        'trades': total,
+        'wins': wins,
+        'losses': total - wins,
+    }
+
+# ---------------------------------------------------------
+# 5. COMPROVACIÓ CONTRA EL MOTOR EN VIU
+# ---------------------------------------------------------
+# Fa córrer TradingEngine (engine.py) sobre les mateixes espelmes amb
+# replay.py (rellotge virtual, sense xarxa) i compara els trades amb
+# run_backtest. Els indicadors de les estratègies en viu tenen longituds
+# fixes: només es poden canviar els paràmetres de mida, nivells i comissió.
+
+LIVE_PARAMS = {
+    'LEVERAGE': 'leverage', 'ALLOCATION_PCT': 'allocation_pct', 'MAX_POSITIONS': 'max_positions',
+    'TARGET_NET_PROFIT': 'target', 'STOP_LOSS_PCT': 'stop', 'COMMISSION_RATE': 'commission',
+    'INITIAL_CAPITAL': 'initial_capital',
+}
+
+def live_trades(frames, strategy='balanced', params=None, out_dir=None):
+    # Trades del motor en viu (mateixes columnes que el ledger: Time, Ticker, Res, PL, PL_pct)
+    import copy
+    import tempfile
+    from replay import replay, trades
+    from strategies import STRATEGIES as LIVE
+
+    p = dict(DEFAULT_PARAMS)
+    p.update(params or {})
+    fixed = [k for k in p if k not in LIVE_PARAMS and p[k] != DEFAULT_PARAMS[k]]
+    if fixed:
+        raise ValueError(f"El motor en viu no admet canviar {', '.join(fixed)}")
+    spec = copy.copy(LIVE[strategy])
+    for key, attr in LIVE_PARAMS.items():
+        setattr(spec, attr, p[key])
+
+    # Fins al cicle de l'última espelma (tancament + marge)
+    last = max(df.index[-1] for df in frames.values() if len(df))
+    end = last + pd.Timedelta(minutes=1, seconds=CLOSE_DELAY + 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        replay(frames, end=end, strategies=[spec], out_dir=out_dir or tmp, telegram=False)
+        return trades(out_dir or tmp, spec)
+
+def check(frames, strategy='balanced', params=None, tol=1e-6):
+    fast = run_backtest(frames, strategy, params)
+    live = live_trades(frames, strategy, params)
+    a = fast['trades']
+    # El motor registra la sortida a l'hora del cicle que la veu
+    a_time = (a['Exit'].map(lambda ts: _cycle_time(pd.Timestamp(ts).as_unit('ns').value).timestamp())
+              if len(a) else pd.Series(dtype=float))
+    order_a = np.lexsort((a['Ticker'].values, a_time.values)) if len(a) else []
+    order_b = np.lexsort((live['Ticker'].values, live['Time'].values)) if len(live) else []
+    same = (len(a) == len(live)
+            and (len(a) == 0
+                 or ((a_time.values[order_a] == live['Time'].values[order_b]).all()
+                     and (a['Ticker'].values[order_a] == live['Ticker'].values[order_b]).all()
+                     and (a['Res'].values[order_a] == live['Res'].values[order_b]).all()
+                     and np.allclose(a['PL'].values[order_a], live['PL'].values[order_b], atol=tol))))
+    return same, fast, live
+
+# ---------------------------------------------------------
+# 6. DADES I LÍNIA D'ORDRES
+# ---------------------------------------------------------
+def load_csv_dir(path, tickers=None):
+    # Un CSV per ticker (<TICKER>.csv) amb índex de temps i columnes OHLCV
+    frames = {}
+    names = tickers or sorted(f[:-4] for f in os.listdir(path) if f.endswith('.csv'))
+    for ticker in names:
+        file = os.path.join(path, f"{ticker}.csv")
+        if os.path.exists(file):
+            frames[ticker] = pd.read_csv(file, index_col=0, parse_dates=True)
+    return frames
+
+def load_bar_store(path, tickers=None, start=None, end=None):
+    # Històric que el bot va desant (bar_store.py): només es copia el tall demanat
+    store = BarStore(path)
+    return {t: store.frame(t, start, end) for t in (tickers or store.tickers()) if store.length(t)}
+
+def load_frames(path, tickers=None, start=None, end=None):
+    # Carpeta de CSV o BarStore, segons el que hi hagi a `path`
+    if os.path.isdir(path) and BarStore(path).tickers():
+        return load_bar_store(path, tickers, start, end)
+    frames = load_csv_dir(path, tickers)
+    if start or end:
+        frames = {t: df.loc[start:end] for t, df in frames.items()}
+    return frames
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest vectoritzat de les estratègies Balanced / Sniper")
+    parser.add_argument('data', help="Carpeta amb un CSV d'espelmes 1m per ticker, o un BarStore")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='balanced')
+    parser.add_argument('--tickers', nargs='*')
+    parser.add_argument('--start', help="Data inicial (p. ex. 2024-01-02)")
+    parser.add_argument('--end', help="Data final")
+    parser.add_argument('--check', action='store_true', help="Compara amb el motor en viu (replay amb temps virtual)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.data, args.tickers, args.start, args.end)
+    start = time.perf_counter()
+    result = run_backtest(frames, args.strategy)
+    elapsed = time.perf_counter() - start
+
+    print(f"⏱️ {len(result['equity'])} espelmes x {len(frames)} tickers en {elapsed:.2f}s")
+    for key, value in summarize(result).items():
+        print(f"  {key}: {value}")
+    if not result['trades'].empty:
+        print(result['trades'].tail(10).to_string())
+
+    if args.check:
+        ok, _, live = check(frames, args.strategy)
+        print("✅ Coincideix amb el motor en viu" if ok else f"❌ Diferències ({len(live)} trades al motor en viu)")
+
+if __name__ == "__main__":
+    main()
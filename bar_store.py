@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# HISTÒRIC D'ESPELMES A DISC (MEMORY-MAPPED)
+# ---------------------------------------------------------
+# Un directori per ticker amb una columna per fitxer, d'amplada fixa i
+# només per afegir:
+#   ts.i8                      temps (ns UTC, int64, ordenat)
+#   Open/High/Low/Close/Volume float64
+#   meta.json                  zona horària original
+# Les lectures són vistes np.memmap (zero còpies): mesos d'espelmes d'1m de
+# tot l'univers es poden consultar sense carregar-los a memòria, i un tall
+# per dates és un searchsorted sobre ts.
+#
+# S'escriuen primer les columnes de preus i l'últim el temps: el nombre de
+# files vàlides és el de ts.i8 (en files senceres), i si un procés mor a mig
+# escriure, la cua sobrant de totes les columnes, ts.i8 inclòs, es retalla al
+# següent append().
+
+BAR_DIR = "bars"
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+TS = "ts.i8"
+
+
+def _ns(when):
+    ts = pd.Timestamp(when)
+    return (ts.tz_localize('UTC') if ts.tzinfo is None else ts).as_unit('ns').value
+
+
+class BarStore:
+    def __init__(self, root=BAR_DIR):
+        self.root = root
+        self.lock = threading.Lock()    # un escriptor; els lectors no bloquegen
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, ticker):
+        return os.path.join(self.root, ticker.replace('/', '_'))
+
+    def _file(self, ticker, name):
+        return os.path.join(self._dir(ticker), name)
+
+    def tickers(self):
+        return sorted(d for d in os.listdir(self.root) if os.path.exists(os.path.join(self.root, d, TS)))
+
+    def length(self, ticker):
+        try:
+            return os.path.getsize(self._file(ticker, TS)) // 8
+        except OSError:
+            return 0
+
+    def timezone(self, ticker):
+        try:
+            with open(self._file(ticker, "meta.json")) as f:
+                return json.load(f).get('tz') or 'UTC'
+        except (OSError, ValueError):
+            return 'UTC'
+
+    # --- Lectura (zero còpies) ---
+    def _map(self, ticker, name, dtype, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(ticker, name), dtype=dtype, mode='r', shape=(n,))
+
+    def timestamps(self, ticker):
+        return self._map(ticker, TS, np.int64, self.length(ticker))
+
+    def last_timestamp(self, ticker):
+        ts = self.timestamps(ticker)
+        if not len(ts):
+            return None
+        return pd.Timestamp(int(ts[-1]), unit='ns', tz='UTC').tz_convert(self.timezone(ticker))
+
+    def _bounds(self, ts, start=None, end=None, last=None):
+        # start/end sense zona horària s'interpreten en UTC
+        lo = 0 if start is None else int(np.searchsorted(ts, _ns(start), side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _ns(end), side='right'))
+        if last is not None:
+            lo = max(lo, hi - last)
+        return lo, hi
+
+    def read(self, ticker, start=None, end=None, last=None):
+        # {'ts': int64 ns UTC, 'Open': ..., ...} com a vistes sobre els fitxers
+        n = self.length(ticker)
+        ts = self._map(ticker, TS, np.int64, n)
+        lo, hi = self._bounds(ts, start, end, last)
+        out = {'ts': ts[lo:hi]}
+        for col in COLUMNS:
+            out[col] = self._map(ticker, col, np.float64, n)[lo:hi]
+        return out
+
+    def frame(self, ticker, start=None, end=None, last=None):
+        # DataFrame (aquí sí es copia) amb el mateix format que la BarCache
+        data = self.read(ticker, start, end, last)
+        index = pd.to_datetime(np.asarray(data['ts']), unit='ns', utc=True).tz_convert(self.timezone(ticker))
+        return pd.DataFrame({col: np.asarray(data[col]) for col in COLUMNS}, index=index)
+
+    # --- Escriptura (només afegir) ---
+    def _repair(self, ticker, n):
+        # Retalla les columnes que un append interromput hagi deixat més llargues;
+        # a ts.i8, els bytes d'una fila a mitges desalinearien tot el que vingui després
+        for name in COLUMNS + [TS]:
+            path = self._file(ticker, name)
+            if os.path.exists(path) and os.path.getsize(path) > n * 8:
+                with open(path, 'r+b') as f:
+                    f.truncate(n * 8)
+
+    def append(self, ticker, df):
+        # Afegeix les espelmes tancades posteriors a l'última desada
+        if df is None or df.empty:
+            return 0
+        index = df.index if df.index.tz is not None else df.index.tz_localize('UTC')
+        ts = index.tz_convert('UTC').as_unit('ns').asi8
+        with self.lock:
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            n = self.length(ticker)
+            self._repair(ticker, n)
+            if n:
+                last = int(self.timestamps(ticker)[-1])
+                keep = ts > last
+                if not keep.any():
+                    return 0
+                ts, df = ts[keep], df[keep]
+            else:
+                with open(self._file(ticker, "meta.json"), 'w') as f:
+                    json.dump({'tz': str(index.tz)}, f)
+            for col in COLUMNS:
+                values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+                with open(self._file(ticker, col), 'ab') as f:
+                    f.write(values.tobytes())
+            with open(self._file(ticker, TS), 'ab') as f:
+                f.write(np.ascontiguousarray(ts, dtype=np.int64).tobytes())
+            return len(ts)
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore
+from engine import TradingEngine
+from indicators import adx_series, ema_series, macd_series, rsi_series
+from metrics import Metrics
+from notifier import TelegramNotifier
+from replay import ReplaySource
+from resample import resample
+from scheduler import VirtualClock
+from screener import Panel
+from strategies import STRATEGIES, TIMEFRAME, columns, pipeline_specs, split
+
+# ---------------------------------------------------------
+# BENCHMARKS DEL CICLE (SENSE XARXA)
+# ---------------------------------------------------------
+# Cronometra cada fase del cicle sobre fixtures amb la forma de yf.download
+# (columnes MultiIndex ticker x OHLCV, files buides on falten espelmes) de
+# 10, 100 i 500 tickers:
+#   slice       data[ticker].copy() de tot l'univers
+#   dropna      neteja de files buides
+#   ind:<col>   cada indicador (fórmules de pandas_ta, indicators.py) sobre tot l'històric
+#   pipeline    TradingEngine.process + Panel.set, STEPS espelmes noves per ticker
+#   decision    StrategyRunner.run_cycle de cada estratègia (inclou el desat)
+#   serialize   StrategyRunner.save amb la cartera plena
+# Per fase: millor temps de REPEAT execucions, rendiment (elements/s) i pic
+# de memòria (tracemalloc, en una execució a part).
+#
+# Les fixtures es generen un cop (llavor fixa) o es graven d'un BarStore
+# (--record bars) i es desen a FIXTURE_DIR. --save desa la línia base
+# (BASELINE_FILE) amb la configuració (--bars, --steps, --record); sense
+# --save es compara amb ella i el procés surt amb codi 1 si alguna fase
+# empitjora més de --margin. Amb una configuració diferent no es compara.
+#
+#   python bench.py --save              # línia base d'aquesta màquina
+#   python bench.py --margin 0.2        # comparació (p. ex. abans d'un commit)
+
+FIXTURE_DIR = "bench_fixtures"
+BASELINE_FILE = "bench_baseline.json"
+SIZES = (10, 100, 500)
+BARS = 600          # espelmes per ticker (prou per escalfar l'EMA 200)
+STEPS = 30          # cicles incrementals a pipeline / decision / serialize
+REPEAT = 5
+MARGIN = 0.25       # empitjorament relatiu tolerat...
+MIN_DELTA = 0.0005  # ...i absolut (s): per sota és soroll
+MIN_DELTA_MB = 1.0
+GAP_RATE = 0.02     # files buides per ticker (forats de Yahoo)
+
+# ---------------------------------------------------------
+# 1. FIXTURES
+# ---------------------------------------------------------
+def synthetic(n, bars=BARS, seed=0):
+    # Camí aleatori amb OHLCV coherent: mateix resultat a totes les màquines
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-08 09:30", periods=bars, freq="1min", tz="America/New_York")
+    frames = {}
+    for k in range(n):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0015, bars)))
+        open_ = np.r_[close[0], close[:-1]]
+        spread = np.abs(rng.normal(0, 0.0008, (2, bars)))
+        df = pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close) * (1 + spread[0]),
+                           'Low': np.minimum(open_, close) * (1 - spread[1]), 'Close': close,
+                           'Volume': rng.integers(100, 10000, bars).astype(float)}, index=index)
+        df[rng.random(bars) < GAP_RATE] = np.nan
+        frames[f"T{k:03d}"] = df
+    return frames
+
+def recorded(path, n, bars=BARS):
+    # Espelmes reals d'un BarStore; si n'hi ha menys de n es repeteixen amb un sufix
+    store = BarStore(path)
+    names = [t for t in store.tickers() if store.length(t) >= bars]
+    if not names:
+        raise SystemExit(f"Cap ticker amb {bars} espelmes a {path}")
+    frames = {}
+    for k in range(n):
+        t = names[k % len(names)]
+        frames[t if k < len(names) else f"{t}.{k // len(names)}"] = store.frame(t, last=bars).tz_convert('UTC')
+    return frames
+
+def yf_shape(frames):
+    # Com yf.download(group_by='ticker'): índex comú i columnes (Ticker, Price)
+    data = pd.concat(frames, axis=1)
+    data.columns.names = ['Ticker', 'Price']
+    return data
+
+def fixture(n, bars=BARS, record=None):
+    tag = "recorded" if record else "synthetic"
+    path = os.path.join(FIXTURE_DIR, f"yf_{tag}_{n}x{bars}.pkl")
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    data = yf_shape(recorded(record, n, bars) if record else synthetic(n, bars))
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    data.to_pickle(path)
+    return data
+
+# ---------------------------------------------------------
+# 2. FASES
+# ---------------------------------------------------------
+VECTOR = {
+    'EMA': lambda df, n: ema_series(df['Close'], n),
+    'RSI': lambda df, n: rsi_series(df['Close'], n),
+    'ADX': lambda df, n: adx_series(df['High'], df['Low'], df['Close'], n),
+    'MACD': lambda df, *lengths: macd_series(df['Close'], *lengths),
+}
+
+def indicator(spec, df):
+    timeframe, (kind, *args) = split(spec)
+    if timeframe != TIMEFRAME:
+        df = resample(df, timeframe)
+    return VECTOR[kind](df, *args)
+
+def _engine(frames, tmp, checkpoint_file=None):
+    # Motor real amb bases de dades temporals, sense Telegram ni fitxers del bot en viu
+    clock = VirtualClock(max(df.index[-1] for df in frames.values()))
+    return TradingEngine(list(STRATEGIES.values()), tickers=list(frames), bar_cache=ReplaySource(frames, clock),
+                         metrics=Metrics(), clock=clock, data_dir=tmp,
+                         notifier=lambda s: TelegramNotifier(None, None), checkpoint_file=checkpoint_file,
+                         metrics_file=None)
+
+def _cycle(engine, view):
+    panel = Panel(engine.tickers, engine.fields)
+    for ticker, df in view.items():
+        panel.set(ticker, engine.process(ticker, df))
+    return panel
+
+class Workload:
+    # Dades i estat escalfat compartits per les fases d'una mida
+    def __init__(self, data, steps=STEPS):
+        self.data = data
+        self.tickers = list(data.columns.get_level_values(0).unique())
+        self.frames = {t: data[t].dropna() for t in self.tickers}
+        self.steps = steps
+        self.root = tempfile.mkdtemp(prefix="bench-")
+        # STEPS cicles: a cada un, una espelma més per ticker (vistes, sense còpia)
+        self.views = [{t: df.iloc[:len(df) - steps + k + 1] for t, df in self.frames.items()}
+                      for k in range(steps)]
+        # Escalfament un sol cop; cada repetició el recupera del checkpoint
+        self.checkpoint = os.path.join(self.root, "warm.ckpt")
+        engine = _engine(self.frames, self.tmp(), self.checkpoint)
+        for t, df in self.frames.items():
+            engine.process(t, df.iloc[:len(df) - steps])
+        engine.checkpoint()
+        self.panels = [_cycle(engine, view) for view in self.views]
+
+    def tmp(self):
+        return tempfile.mkdtemp(dir=self.root)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def stages(self):
+        n, specs = len(self.tickers), pipeline_specs(STRATEGIES.values())[0]
+        bars = sum(len(df) for df in self.frames.values())
+        out = [
+            ('slice', lambda: None, lambda _: {t: self.data[t].copy() for t in self.tickers}, n),
+            ('dropna', lambda: {t: self.data[t] for t in self.tickers},
+             lambda raw: {t: df.dropna() for t, df in raw.items()}, n),
+        ]
+        for spec in specs:
+            out.append((f"ind:{columns(spec)[0]}", lambda: None,
+                        lambda _, spec=spec: [indicator(spec, df) for df in self.frames.values()], bars))
+        out += [
+            ('pipeline', self._pipeline, lambda engine: [_cycle(engine, view) for view in self.views],
+             n * self.steps),
+            ('decision', lambda: _engine(self.frames, self.tmp()), self._decision, n * self.steps),
+            ('serialize', self._portfolio, self._serialize, self.steps * len(STRATEGIES)),
+        ]
+        return out
+
+    def _pipeline(self):
+        engine = _engine(self.frames, self.tmp(), self.checkpoint)
+        engine.restore()
+        return engine
+
+    def _decision(self, engine):
+        for panel in self.panels:
+            for runner in engine.runners:
+                runner.run_cycle(panel)
+
+    def _portfolio(self):
+        # Cartera plena (max_positions obertes) i un trade per desat
+        engine = _engine(self.frames, self.tmp())
+        for runner in engine.runners:
+            p = runner.portfolio
+            for i in range(min(runner.strategy.max_positions, len(p.tickers))):
+                p.enter(i, 100.0, 1000.0)
+            p.mark(np.full(len(p.tickers), 100.5))
+        return engine
+
+    def _serialize(self, engine):
+        for k in range(self.steps):
+            for runner in engine.runners:
+                runner.save([runner.ledger.add(runner.portfolio.tickers[0], 1.0, 0.001, True, ts=float(k))])
+
+# ---------------------------------------------------------
+# 3. MESURA I LÍNIA BASE
+# ---------------------------------------------------------
+def measure(setup, run, repeat=REPEAT):
+    # Millor temps de `repeat` execucions; el pic de memòria en una a part
+    # (tracemalloc alenteix el codi que mesura)
+    best = float('inf')
+    for _ in range(repeat):
+        ctx = setup()
+        start = time.perf_counter()
+        run(ctx)
+        best = min(best, time.perf_counter() - start)
+    ctx = setup()
+    tracemalloc.start()
+    try:
+        run(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def run_suite(sizes=SIZES, bars=BARS, steps=STEPS, repeat=REPEAT, record=None, only=None):
+    results = {}
+    for n in sizes:
+        work = Workload(fixture(n, bars, record), steps)
+        try:
+            for name, setup, run, items in work.stages():
+                if only and not any(name.startswith(o) for o in only):
+                    continue
+                seconds, peak = measure(setup, run, repeat)
+                results[f"{n}/{name}"] = {'seconds': seconds, 'per_second': items / seconds if seconds else 0.0,
+                                          'peak_mb': peak / 2 ** 20}
+        finally:
+            work.close()
+    return results
+
+def regressions(results, baseline, margin=MARGIN, min_delta=MIN_DELTA, min_delta_mb=MIN_DELTA_MB):
+    # [(clau, mètrica, base, ara)] de les fases que empitjoren més del marge
+    out = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if now['seconds'] > base['seconds'] * (1 + margin) and now['seconds'] - base['seconds'] > min_delta:
+            out.append((key, 'seconds', base['seconds'], now['seconds']))
+        if now['peak_mb'] > base['peak_mb'] * (1 + margin) and now['peak_mb'] - base['peak_mb'] > min_delta_mb:
+            out.append((key, 'peak_mb', base['peak_mb'], now['peak_mb']))
+    return out
+
+def suite_config(bars=BARS, steps=STEPS, record=None):
+    # El que fa comparables dues execucions (la mida de l'univers ja va a cada clau)
+    return {'bars': bars, 'steps': steps, 'record': record}
+
+def load_baseline(path=BASELINE_FILE):
+    # (config, resultats); sense fitxer: (None, {})
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    return saved.get('config'), saved.get('results', {})
+
+def save_baseline(results, config, path=BASELINE_FILE):
+    # Amb la mateixa configuració, les entrades d'aquesta execució substitueixen
+    # les antigues i la resta es conserven; amb una altra, la base es reinicia
+    old_config, old = load_baseline(path)
+    merged = {**old, **results} if old_config == config else dict(results)
+    with open(path, 'w') as f:
+        json.dump({'config': config, 'results': merged}, f, indent=1, sort_keys=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del cicle sobre fixtures gravades, sense xarxa")
+    parser.add_argument('--sizes', nargs='*', type=int, default=list(SIZES))
+    parser.add_argument('--bars', type=int, default=BARS)
+    parser.add_argument('--steps', type=int, default=STEPS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', nargs='*', help="Només les fases que comencen així (p. ex. ind pipeline)")
+    parser.add_argument('--record', help="BarStore d'on gravar les fixtures en lloc de generar-les")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help="Desa els resultats com a línia base")
+    parser.add_argument('--margin', type=float, default=MARGIN, help="Empitjorament tolerat (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    config = suite_config(args.bars, args.steps, args.record)
+    base_config, baseline = load_baseline(args.baseline)
+    if baseline and base_config != config and not args.save:
+        raise SystemExit(f"La línia base ({args.baseline}) és d'una altra configuració: {base_config} "
+                         f"(ara {config}). Repeteix-la amb aquests paràmetres o desa'n una de nova amb --save")
+    results = run_suite(args.sizes, args.bars, args.steps, args.repeat, args.record, args.only)
+    if base_config != config:
+        baseline = {}
+    print(f"{'fase':<28}{'temps':>12}{'elements/s':>14}{'pic MB':>10}{'vs base':>10}")
+    for key, r in results.items():
+        base = baseline.get(key)
+        delta = f"{r['seconds'] / base['seconds'] - 1:+.0%}" if base and base['seconds'] else ""
+        print(f"{key:<28}{r['seconds'] * 1e3:>10.2f}ms{r['per_second']:>14,.0f}{r['peak_mb']:>10.2f}{delta:>10}")
+
+    if args.save:
+        save_baseline(results, config, args.baseline)
+        print(f"💾 Línia base desada a {args.baseline}")
+        return
+    if not baseline:
+        print(f"Sense línia base ({args.baseline}): executa amb --save per crear-la")
+        return
+    slow = regressions(results, baseline, args.margin)
+    for key, metric, before, after in slow:
+        print(f"❌ {key} {metric}: {before:.4g} -> {after:.4g}")
+    if slow:
+        raise SystemExit(1)
+    print(f"✅ Cap fase empitjora més d'un {args.margin:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,282 +1,53 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
-import pandas_ta as ta
-import requests
-import time
-import os
-import json
-from datetime import datetime
+from state_store import StateStore
+from strategies import BALANCED, TICKERS
+from engine import start_engine
+from dashboard import Dashboard, SnapshotCache
 
 # ---------------------------------------------------------
 # 1. CONFIGURACIÓ "EQUILIBRADA"
 # ---------------------------------------------------------
+# Paràmetres i regla d'entrada: strategies.BALANCED (EMA 50 + RSI + ADX).
+# El motor compartit (engine.py) fa la descàrrega i els indicadors per a
+# totes les estratègies; aquest script només mostra l'estat desat.
 st.set_page_config(page_title="Bot Equilibrat 0.85%", layout="wide", page_icon="⚖️")
 
-TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-
-# CARTERA (Diversificada)
-TICKERS = ['NVDA', 'TSLA', 'AMZN', 'META', 'LLY', 'JPM', 'USO', 'GLD', 'BTC-USD', 'COST']
-
-TIMEFRAME = "1m"        
-LEVERAGE = 5            
-
-# GESTIÓ DE CAPITAL
-ALLOCATION_PCT = 0.10   # 10% per operació
-MAX_POSITIONS = 10      
-
-# NOUS OBJECTIUS (MODIFICATS)
-TARGET_NET_PROFIT = 0.0085  # 0.85% Net
-STOP_LOSS_PCT = 0.0085      # 0.85% Stop (Ratio 1:1)
-
-# Comissions estimades
-COMMISSION_RATE = 0.001 
-
-INITIAL_CAPITAL = 10000.0
-DATA_FILE = "bot_balanced_data.json"
+HISTORY_SHOWN = 5
 
 # ---------------------------------------------------------
-# 2. PERSISTÈNCIA
+# 2. PERSISTÈNCIA (NOMÉS LECTURA)
 # ---------------------------------------------------------
-def save_state():
-    data = {
-        'balance': st.session_state.balance,
-        'equity': st.session_state.equity,
-        'wins': st.session_state.wins,
-        'losses': st.session_state.losses,
-        'portfolio': st.session_state.portfolio,
-        'history': st.session_state.history,
-        'last_update': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f)
-    except: pass
-
-def load_state():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except: return None
-    return None
-
-saved_data = load_state()
-if saved_data:
-    if 'balance' not in st.session_state:
-        st.session_state.balance = saved_data.get('balance', INITIAL_CAPITAL)
-        st.session_state.equity = saved_data.get('equity', INITIAL_CAPITAL)
-        st.session_state.wins = saved_data.get('wins', 0)
-        st.session_state.losses = saved_data.get('losses', 0)
-        st.session_state.portfolio = saved_data.get('portfolio', {})
-        st.session_state.history = saved_data.get('history', [])
-        st.toast("⚖️ Bot Equilibrat carregat.")
-else:
-    if 'balance' not in st.session_state:
-        st.session_state.balance = INITIAL_CAPITAL 
-        st.session_state.equity = INITIAL_CAPITAL  
-        st.session_state.wins = 0
-        st.session_state.losses = 0
-        st.session_state.history = []
-    if 'portfolio' not in st.session_state:
-        st.session_state.portfolio = {
-            t: {'status': 'CASH', 'entry_price': 0.0, 'invested': 0.0, 'shares': 0.0, 'stop': 0.0, 'target': 0.0} 
-            for t in TICKERS
-        }
-
-if len(st.session_state.history) > 50:
-    st.session_state.history = st.session_state.history[-50:]
+@st.cache_resource
+def get_snapshots():
+    # Importa el JSON antic el primer cop que s'obre la base de dades;
+    # una sola lectura per versió per a totes les pestanyes
+    store = StateStore(BALANCED.db_file, legacy_json=BALANCED.legacy_json)
+    return SnapshotCache(store, history_limit=HISTORY_SHOWN)
 
 # ---------------------------------------------------------
-# 3. MOTOR D'ANÀLISI
+# 3. WEB
 # ---------------------------------------------------------
-def send_telegram(msg):
-    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID: return
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        payload = {"chat_id": TELEGRAM_CHAT_ID, "text": f"⚖️ [BOT 0.85%]\n{msg}", "parse_mode": "Markdown"}
-        requests.post(url, json=payload)
-    except: pass
+def tile(ticker, item):
+    # --- VISUALITZACIÓ ---
+    if item['status'] == 'INVESTED':
+        pnl = item.get('pnl', 0.0)
+        color = "green" if pnl > 0 else "red"
+        return [('html', f"<span style='color:{color}'>{pnl:.2f}$</span>")]
+    return [('caption', f"{item.get('price', 0.0):.2f}$")]
 
-def get_data_balanced(tickers):
-    try:
-        # Baixem 5 dies per tenir dades sòlides
-        data = yf.download(tickers, period="5d", interval="1m", group_by='ticker', progress=False, auto_adjust=True, threads=False)
-        processed = {}
-        for ticker in tickers:
-            try:
-                if len(tickers) > 1:
-                    if ticker not in data.columns.levels[0]: continue
-                    df = data[ticker].copy()
-                else:
-                    df = data.copy()
-            except: continue
+def header(data):
+    open_positions = sum(1 for item in data['portfolio'].values() if item['status'] == 'INVESTED')
+    total = data['wins'] + data['losses']
+    wr = (data['wins']/total*100) if total > 0 else 0
+    return [("Valor Compte", f"{data['equity']:.2f} $"),
+            ("Cash", f"{data['balance']:.2f} $"),
+            ("Posicions", f"{open_positions} / {BALANCED.max_positions}"),
+            ("Win Rate", f"{wr:.1f}%")]
 
-            if df.empty or len(df) < 50: continue # Mínim 50 espelmes per la EMA
-            df = df.dropna()
+# Un sol motor per màquina, encara que hi hagi moltes pestanyes obertes
+engine_here = start_engine()
 
-            # --- NOUS INDICADORS (TERME MIG) ---
-            
-            # 1. EMA 50 (Filtre de Tendència Intermèdia)
-            # Molt més reactiva que la de 200, però més segura que la de 20.
-            df['EMA_50'] = ta.ema(df['Close'], length=50)
-            
-            # 2. RSI (Momentum Clàssic)
-            df['RSI'] = ta.rsi(df['Close'], length=14)
-            
-            # 3. ADX (Opcional: només per evitar mercat totalment mort)
-            try:
-                adx = ta.adx(df['High'], df['Low'], df['Close'], length=14)
-                df['ADX'] = adx[adx.columns[0]] if adx is not None else 0
-            except: df['ADX'] = 0
-
-            df = df.dropna()
-            if not df.empty:
-                processed[ticker] = df.tail(2)
-        return processed
-    except: return {}
-
-# ---------------------------------------------------------
-# 4. BUCLE PRINCIPAL
-# ---------------------------------------------------------
 st.title("⚖️ Bot Equilibrat: Objectiu 0.85%")
 st.caption("Estratègia: Trend (EMA 50) + Momentum (RSI > 50). Ni massa agressiu, ni massa lent.")
 
-current_equity = st.session_state.balance
-positions_count = 0
-
-placeholder = st.empty()
-
-while True:
-    with placeholder.container():
-        market_data = get_data_balanced(TICKERS)
-        changes_made = False
-        
-        temp_equity = st.session_state.balance
-        
-        cols = st.columns(5)
-        
-        for i, ticker in enumerate(TICKERS):
-            item = st.session_state.portfolio[ticker]
-            current_price = 0.0
-            
-            # Inicialitzem variables per evitar errors visuals
-            net_pnl = 0.0
-            net_pnl_pct = 0.0
-
-            if market_data and ticker in market_data:
-                df = market_data[ticker]
-                if len(df) >= 1:
-                    current_price = float(df.iloc[-1]['Close'])
-            
-            if current_price == 0.0 and item['status'] == 'INVESTED':
-                current_price = item['entry_price']
-
-            # --- GESTIÓ POSICIONS ---
-            if item['status'] == 'INVESTED' and current_price > 0:
-                positions_count += 1
-                
-                # Càlcul P&L
-                gross_value = (item['invested'] * LEVERAGE / item['entry_price']) * current_price
-                lev_invested = item['invested'] * LEVERAGE
-                gross_pnl = gross_value - lev_invested
-                commission_cost = lev_invested * COMMISSION_RATE
-                
-                net_pnl = gross_pnl - commission_cost
-                net_pnl_pct = (net_pnl / item['invested']) 
-                
-                temp_equity += (item['invested'] + net_pnl)
-
-                # SORTIDA: 0.85% Net
-                if net_pnl_pct >= TARGET_NET_PROFIT:
-                    st.session_state.balance += (item['invested'] + net_pnl)
-                    st.session_state.wins += 1
-                    st.session_state.history.append({
-                        'Ticker': ticker, 'Res': 'WIN', 'PL': f"+{net_pnl:.2f}$ ({net_pnl_pct*100:.2f}%)"
-                    })
-                    item['status'] = 'CASH'
-                    send_telegram(f"✅ WIN: {ticker}\nBenefici: +{net_pnl:.2f}$ (+0.85%)")
-                    changes_made = True
-                
-                elif net_pnl_pct <= -STOP_LOSS_PCT:
-                    remaining = item['invested'] + net_pnl
-                    st.session_state.balance += remaining
-                    st.session_state.losses += 1
-                    st.session_state.history.append({
-                        'Ticker': ticker, 'Res': 'LOSS', 'PL': f"{net_pnl:.2f}$ ({net_pnl_pct*100:.2f}%)"
-                    })
-                    item['status'] = 'CASH'
-                    send_telegram(f"❌ LOSS: {ticker}\nPèrdua: {net_pnl:.2f}$")
-                    changes_made = True
-
-            # --- ENTRADA: ESTRATÈGIA EQUILIBRADA ---
-            elif item['status'] == 'CASH' and market_data and ticker in market_data:
-                df = market_data[ticker]
-                if len(df) >= 2:
-                    curr = df.iloc[-1]
-                    prev = df.iloc[-2]
-                    current_price = float(curr['Close'])
-                    
-                    trade_size = st.session_state.equity * ALLOCATION_PCT
-                    
-                    if st.session_state.balance >= trade_size:
-                        
-                        # 1. TENDÈNCIA: Preu per sobre de l'EMA 50
-                        # Això indica que a curt/mig termini la tendència és alcista.
-                        # Molt més fàcil de complir que l'EMA 200.
-                        trend_ok = current_price > curr['EMA_50']
-                        
-                        # 2. MOMENTUM: RSI creua 50 cap amunt
-                        # Indiquem que la força compradora està guanyant terreny.
-                        # Evitem comprar si ja està massa car (RSI > 70)
-                        rsi_rising = (prev['RSI'] < 50) and (curr['RSI'] > 50)
-                        not_overbought = curr['RSI'] < 70
-                        
-                        # 3. ACTIVITAT: ADX > 20
-                        # Ens assegurem que el mercat no estigui totalment pla.
-                        adx_ok = curr['ADX'] > 20
-                        
-                        # ENTRADA
-                        if trend_ok and rsi_rising and not_overbought and adx_ok:
-                            item['status'] = 'INVESTED'
-                            item['entry_price'] = current_price
-                            item['invested'] = trade_size
-                            
-                            st.session_state.balance -= trade_size
-                            send_telegram(f"⚖️ ENTRADA: {ticker}\nPreu > EMA50 + RSI Creuant 50\nInversió: {trade_size:.2f}$")
-                            changes_made = True
-            
-            # --- VISUALITZACIÓ ---
-            col_idx = i % 5 
-            with cols[col_idx]:
-                border = "green" if item['status'] == 'INVESTED' else "grey"
-                with st.container(border=True):
-                    st.markdown(f"**{ticker}**")
-                    if item['status'] == 'INVESTED':
-                        color = "green" if net_pnl > 0 else "red"
-                        st.markdown(f"<span style='color:{color}'>{net_pnl:.2f}$</span>", unsafe_allow_html=True)
-                    else:
-                        st.caption(f"{current_price:.2f}$")
-
-        st.session_state.equity = temp_equity
-        
-        m1, m2, m3, m4 = st.columns(4)
-        m1.metric("Valor Compte", f"{st.session_state.equity:.2f} $")
-        m2.metric("Cash", f"{st.session_state.balance:.2f} $")
-        
-        open_pos = sum(1 for t in TICKERS if st.session_state.portfolio[t]['status'] == 'INVESTED')
-        m3.metric("Posicions", f"{open_pos} / 10")
-        
-        total = st.session_state.wins + st.session_state.losses
-        wr = (st.session_state.wins/total*100) if total > 0 else 0
-        m4.metric("Win Rate", f"{wr:.1f}%")
-
-        if changes_made:
-            save_state()
-
-        if st.session_state.history:
-            st.write("---")
-            st.dataframe(pd.DataFrame(st.session_state.history).iloc[::-1].head(5))
-
-    time.sleep(60)
\ No newline at end of file
+Dashboard(get_snapshots(), TICKERS, tile, header, engine_here=engine_here).run()
@@ -0,0 +1,50 @@
+import os
+import pickle
+import time
+
+# ---------------------------------------------------------
+# CHECKPOINT DEL MOTOR (ARRENCADA EN CALENT)
+# ---------------------------------------------------------
+# El que no és a la base de dades ni al BarStore: l'estat dels indicadors
+# incrementals (EMA/RSI/ADX/MACD, última espelma consumida per ticker), les
+# espelmes superiors en curs i el que el monitor de sortides ja ha revisat.
+# Cartera, saldo i trades continuen a SQLite (es desen a cada cicle) i les
+# espelmes al BarStore: en tornar a arrencar, el motor restaura aquest
+# fitxer, la BarCache llegeix el disc i només baixa el forat, i cada
+# indicador consumeix només les espelmes posteriors a la seva última.
+#
+# Escriptura atòmica (tmp + os.replace). Un checkpoint d'una altra
+# configuració d'indicadors o massa vell es descarta: el motor arrenca en fred.
+
+CHECKPOINT_FILE = "bot_engine.ckpt"
+FORMAT = 1
+
+
+def save(path, specs, payload):
+    tmp = f"{path}.tmp"
+    data = {'format': FORMAT, 'time': time.time(), 'specs': list(specs), 'payload': payload}
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"Error desant el checkpoint: {e}")
+
+
+def load(path, specs, max_age):
+    # Retorna el payload, o None si no n'hi ha o no es pot fer servir
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Checkpoint il·legible, arrencada en fred: {e}")
+        return None
+    if data.get('format') != FORMAT or data.get('specs') != list(specs):
+        print("Checkpoint d'una altra configuració d'indicadors, arrencada en fred")
+        return None
+    if time.time() - data.get('time', 0) > max_age:
+        print("Checkpoint massa vell, arrencada en fred")
+        return None
+    return data['payload']
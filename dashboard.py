@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from ledger import summary
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# DASHBOARD INCREMENTAL
+# ---------------------------------------------------------
+# Cada peça de la pàgina (capçalera, mètriques, una targeta per ticker,
+# historial, latència) té el seu st.empty() creat un sol cop. A cada passada
+# es calcula el contingut de cada peça i només es torna a dibuixar si ha
+# canviat respecte de l'última passada d'aquest visitant: una targeta que no
+# es mou no envia res pel websocket.
+#
+# SnapshotCache és una per procés: la base de dades es llegeix un cop per
+# versió desada, la comparteixen tots els visitants, i l'historial en
+# DataFrame es construeix un sol cop per versió del llibre de trades.
+
+REFRESH_SECONDS = 10
+LATENCY_EVERY = 6       # passades entre refrescos del panell de latència
+
+
+class SnapshotCache:
+    def __init__(self, store, history_limit):
+        self.store = store
+        self.history_limit = history_limit
+        self.lock = threading.Lock()
+        self.version = None
+        self.data = None
+        self.views = {}         # vistes derivades (DataFrames) de la versió actual
+
+    def get(self):
+        # Una consulta per clau primària per passada; load() només si hi ha versió nova
+        version = self.store.version()
+        with self.lock:
+            if version is None or version != self.version:
+                self.data = self.store.load(history_limit=self.history_limit)
+                self.version = (self.data or {}).get('version')
+                self.views = {}
+            return self.version, self.data
+
+    def history(self):
+        # (clau del llibre, historial més recent primer, resum) compartits
+        with self.lock:
+            if 'history' not in self.views and self.data is not None:
+                hist = self.data.get('history', [])
+                df = pd.DataFrame(hist).iloc[::-1]
+                if not df.empty:
+                    df['Time'] = pd.to_datetime(df['Time'], unit='s')
+                key = (len(hist), hist[-1]['Time'] if hist else None)
+                self.views['history'] = (key, df, summary(self.data.get('stats')))
+            return self.views.get('history')
+
+
+class Dashboard:
+    def __init__(self, snapshots, tickers, tile, header, columns=5, engine_here=True):
+        # tile(ticker, item) i header(data) retornen contingut declaratiu:
+        #   tile   -> [('markdown' | 'html' | 'caption', text), ...]
+        #   header -> [(etiqueta, valor), ...] per st.metric
+        self.snapshots = snapshots
+        self.tickers = tickers
+        self.tile = tile
+        self.header = header
+        self.engine_here = engine_here
+        self.rendered = {}      # peça -> contingut de l'última passada
+
+        self.status = st.empty()
+        self.metrics = st.empty()
+        cols = st.columns(columns)
+        self.tiles = {t: cols[i % columns].empty() for i, t in enumerate(tickers)}
+        self.history = st.empty()
+        self.latency = st.empty()
+        self.passes = 0
+
+    def _changed(self, name, content):
+        if self.rendered.get(name) == content:
+            return False
+        self.rendered[name] = content
+        return True
+
+    def _draw_tile(self, slot, ticker, lines):
+        with slot.container(border=True):
+            st.markdown(f"**{ticker}**")
+            for kind, text in lines:
+                if kind == 'caption':
+                    st.caption(text)
+                else:
+                    st.markdown(text, unsafe_allow_html=(kind == 'html'))
+
+    def render(self, data):
+        if data is None:
+            if self._changed('status', None):
+                self.status.info("⏳ Primer cicle en curs...")
+            return
+
+        last_update = data.get('last_update')
+        if self._changed('status', last_update):
+            self.status.write(f"🔄 Última actualització: **{last_update}**")
+
+        header = tuple(self.header(data))
+        if self._changed('metrics', header):
+            with self.metrics.container():
+                for col, (label, value) in zip(st.columns(len(header)), header):
+                    col.metric(label, value)
+
+        portfolio = data.get('portfolio', {})
+        for ticker, slot in self.tiles.items():
+            if ticker not in portfolio: continue
+            lines = tuple(self.tile(ticker, portfolio[ticker]))
+            if self._changed(('tile', ticker), lines):
+                self._draw_tile(slot, ticker, lines)
+
+        view = self.snapshots.history()
+        if view is not None:
+            key, history, stats = view
+            if not history.empty and self._changed('history', key):
+                with self.history.container():
+                    st.write("---")
+                    st.dataframe(history)
+                    st.dataframe(stats)
+
+    def render_latency(self):
+        # --- MÈTRIQUES DEL CICLE ---
+        with self.latency.container():
+            with st.expander("⏱️ Latència per fase"):
+                if not self.engine_here:
+                    st.caption("El motor corre en un altre procés: vegeu bot_engine_metrics.prom")
+                phases, counters = METRICS.summary()
+                st.dataframe(phases.round(1))
+                st.json(counters)
+
+    def run(self, interval=REFRESH_SECONDS):
+        while True:
+            with METRICS.timer('render'):
+                _, data = self.snapshots.get()
+                self.render(data)
+                if self.passes % LATENCY_EVERY == 0:
+                    self.render_latency()
+            self.passes += 1
+            time.sleep(interval)
@@ -0,0 +1,375 @@
+import fcntl
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import checkpoint
+from checkpoint import CHECKPOINT_FILE
+from market_cache import BarCache, MAX_GAP
+from bar_store import BarStore
+from state_store import StateStore
+from ledger import TradeLedger
+from portfolio import Portfolio
+from exit_monitor import ExitMonitor, MONITOR_INTERVAL
+from notifier import TelegramNotifier
+from metrics import METRICS
+from indicators import IndicatorEngine
+from resample import MultiTimeframe
+from scheduler import SYSTEM_CLOCK, active_tickers, closed_bars, open_tickers, seconds_to_next_bar
+from screener import Panel
+from strategies import STRATEGIES, TICKERS, TIMEFRAME, columns, pipeline_specs, split
+
+# ---------------------------------------------------------
+# MOTOR COMPARTIT DE ESTRATÈGIES
+# ---------------------------------------------------------
+# Una sola BarCache i un sol pipeline d'indicadors per a totes les
+# estratègies: cada cicle baixa les espelmes un cop, calcula cada indicador
+# diferent un cop per ticker i avalua totes les estratègies sobre la mateixa
+# instantània. Cada estratègia té la seva cartera, el seu ledger i la seva
+# base de dades (la que ja llegien bot_proves.py i bot_test.py).
+#
+# Només un procés per màquina fa córrer el motor (bloqueig sobre
+# LOCK_FILE); la resta de pestanyes i scripts només llegeixen les bases de
+# dades. BOT_ENGINE=external fa que les interfícies no l'arrenquin mai i el
+# motor corri a part amb `python engine.py`.
+#
+# La font d'espelmes és qualsevol objecte amb refresh_iter(tickers),
+# refresh(tickers) i frames (la BarCache en viu, ReplaySource a replay.py),
+# i l'hora surt d'un rellotge (scheduler.py): el mateix codi corre en viu o
+# reproduint dades gravades amb temps virtual.
+
+CYCLE_SECONDS = 60
+LOCK_FILE = "bot_engine.lock"
+BAR_DIR = os.environ.get("BAR_DIR", "bars")     # Històric d'espelmes 1m a disc
+METRICS_FILE = "bot_engine_metrics.prom"
+METRICS_PORT = os.environ.get("METRICS_PORT")    # Endpoint /metrics opcional
+
+TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
+TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+
+
+class StrategyRunner:
+    # Cartera, ledger, notificacions i sortides d'una estratègia
+    def __init__(self, strategy, tickers, metrics=METRICS, clock=SYSTEM_CLOCK, data_dir=None, notifier=None):
+        self.strategy = strategy
+        self.tickers = tickers
+        self.metrics = metrics
+        self.clock = clock
+        # data_dir: bases de dades a part (replay); el JSON antic només s'importa en viu
+        if data_dir is None:
+            self.store = StateStore(strategy.db_file, legacy_json=strategy.legacy_json)
+        else:
+            self.store = StateStore(os.path.join(data_dir, strategy.db_file))
+        self.notifier = notifier or TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, prefix=strategy.label,
+                                                     metrics=metrics)
+        self.monitor = ExitMonitor(strategy.leverage, strategy.target, strategy.stop, strategy.commission)
+        self.state, self.portfolio, self.ledger = self.load()
+
+    def load(self):
+        s = self.strategy
+        # L'historial es queda a la base de dades: només calen els escalars i la cartera
+        saved = self.store.load(history_limit=0) or {}
+        state = {
+            'balance': saved.get('balance', s.initial_capital),
+            'equity': saved.get('equity', s.initial_capital),
+            'wins': saved.get('wins', 0),
+            'losses': saved.get('losses', 0),
+            'stats': saved.get('stats'),
+        }
+        # Tickers afegits a l'univers després de l'últim desat surten en CASH
+        portfolio = Portfolio.from_dict(saved.get('portfolio', {}), self.tickers, s.leverage, s.commission,
+                                        max_positions=s.max_positions)
+        # Estadístiques desades: no cal recórrer l'historial
+        ledger = TradeLedger(stats=state['stats'])
+        return state, portfolio, ledger
+
+    def save(self, trades=()):
+        # Una transacció petita: escalars, cartera i només els trades nous
+        now = datetime.fromtimestamp(self.clock.now().timestamp())
+        self.state['last_update'] = now.strftime("%Y-%m-%d %H:%M:%S")
+        self.state['portfolio'] = self.portfolio.to_dict()
+        try:
+            with self.metrics.timer('persist'):
+                self.store.save(self.state, trades)
+        except Exception as e:
+            print(f"Error desant l'estat ({self.strategy.name}): {e}")
+
+    def close(self, i, price, net_pnl, net_pnl_pct, win):
+        p, ticker = self.portfolio, self.portfolio.tickers[i]
+        self.state['balance'] += (p.invested[i] + net_pnl)
+        p.exit(i, price)
+        self.state['wins' if win else 'losses'] += 1
+        self.notifier.send(self.strategy.messages['win' if win else 'loss'].format(ticker=ticker, pnl=net_pnl))
+        return self.ledger.add(ticker, net_pnl, net_pnl_pct, win=win, ts=self.clock.now().timestamp())
+
+    def run_cycle(self, panel):
+        s, state, p = self.strategy, self.state, self.portfolio
+
+        # Mida de les entrades amb el valor del compte del cicle anterior
+        trade_size = state['equity'] * s.allocation_pct
+
+        # --- GESTIÓ POSICIONS (vectorial) ---
+        # La cartera comença pels tickers del panell (les posicions òrfenes van al final)
+        extra = len(p.tickers) - len(panel.tickers)
+        p.mark(np.concatenate([panel.close, np.full(extra, np.nan)]))
+        # Valor del compte amb les posicions obertes a l'inici del cicle
+        state['equity'] = state['balance'] + p.value()
+
+        # SORTIDA: objectiu o stop (un ticker que surt no torna a entrar en el mateix cicle,
+        # i amb el mercat tancat no s'hi entra mai)
+        eligible = ~p.open[:len(panel.tickers)] & panel.tradable
+        trades = [self.close(i, float(p.price[i]), float(p.pnl[i]), float(p.pnl_pct[i]), bool(p.pnl_pct[i] >= s.target))
+                  for i in p.exits(s.target, s.stop)]
+
+        # --- ENTRADA: regla de l'estratègia, sobre tot el panell alhora ---
+        for i in panel.candidates(s, eligible=eligible):
+            if not p.can_open() or state['balance'] < trade_size:
+                break
+            price = float(p.price[i])
+            p.enter(i, price, trade_size)
+            self.monitor.opened(p.tickers[i], panel.time[i])
+            state['balance'] -= trade_size
+            self.notifier.send(s.messages['entry'].format(ticker=p.tickers[i], size=trade_size))
+
+        state['stats'] = self.ledger.stats()
+        # Es desa cada cicle: les interfícies llegeixen preus i P&L de la base de dades
+        self.save(trades)
+
+    def on_exit(self, ticker, price):
+        # Sortida detectada entre cicles (stop/objectiu tocat dins l'espelma)
+        p = self.portfolio
+        i = p.index[ticker]
+        net_pnl, net_pnl_pct = p.net_pnl(price, p.entry_price[i], p.invested[i])
+        # L'objectiu és per sobre de l'entrada i l'stop per sota
+        trade = self.close(i, price, float(net_pnl), float(net_pnl_pct), bool(price > p.entry_price[i]))
+        self.state['stats'] = self.ledger.stats()
+        self.save([trade])
+
+
+class TradingEngine:
+    def __init__(self, strategies, tickers=TICKERS, bar_cache=None, metrics=METRICS, clock=SYSTEM_CLOCK,
+                 data_dir=None, notifier=None, monitor_interval=MONITOR_INTERVAL,
+                 checkpoint_file=CHECKPOINT_FILE, metrics_file=METRICS_FILE):
+        # notifier: funció estratègia -> notificador (per defecte Telegram amb les variables d'entorn).
+        # checkpoint_file / metrics_file a None: no s'escriuen (replay)
+        self.tickers = tickers
+        self.metrics = metrics
+        self.clock = clock
+        self.monitor_interval = monitor_interval
+        self.checkpoint_file = checkpoint_file
+        self.metrics_file = metrics_file
+        self.bar_cache = bar_cache or BarCache(interval=TIMEFRAME, store=BarStore(BAR_DIR), metrics=metrics)
+        # Cada indicador diferent un sol cop per ticker, sigui quina sigui l'estratègia
+        self.specs, factories = pipeline_specs(strategies)
+        self.indicators = {tf: IndicatorEngine(f, partial=True) for tf, f in factories.items()}
+        # Temporalitats superiors: derivades de l'1m, sense descàrregues extra
+        self.higher = {tf: [c for spec in self.specs if split(spec)[0] == tf for c in columns(spec)]
+                       for tf in factories if tf != TIMEFRAME}
+        self.resampler = MultiTimeframe(self.higher)
+        self.stale_results = {}     # ticker -> (finestra en cache, espelmes tancades, sortida) amb el mercat tancat
+        self.fields = [c for spec in self.specs for c in columns(spec)]
+        self.runners = [StrategyRunner(s, tickers, metrics, clock, data_dir, notifier(s) if notifier else None)
+                        for s in strategies]
+
+    def market_data(self):
+        # Panell tickers x camps amb prev/curr de tots els indicadors
+        panel = Panel(self.tickers, self.fields)
+        now = self.clock.now()
+        tradable = set(open_tickers(self.tickers, now))
+        live = active_tickers(self.tickers, now)
+        closed = len(self.tickers) - len(live)
+        if closed:
+            # Mercat tancat: cap petició; l'última espelma en cache només serveix per valorar
+            self.metrics.inc('skipped_tickers_total', {'reason': 'market_closed'}, closed)
+            self.stale(panel, set(live), now)
+        try:
+            seen = set()
+            shards = self.bar_cache.refresh_iter(live)
+            while True:
+                # Cada lot es processa tan bon punt arriba
+                with self.metrics.timer('download'):
+                    data = next(shards, None)
+                if data is None: break
+                seen.update(data)
+                for ticker, df in data.items():
+                    if df.empty:
+                        continue
+                    # prev/curr = les 2 últimes espelmes tancades, amb tots els indicadors del pipeline
+                    df, fresh = closed_bars(df, now)
+                    with self.metrics.timer('indicators'):
+                        out = self.process(ticker, df)
+                    if out is not None:
+                        # Sense espelma nova, o amb la sessió ja tancada, només serveix per valorar
+                        panel.set(ticker, out, tradable=fresh and ticker in tradable)
+                    else:
+                        self.metrics.inc('skipped_tickers_total', {'reason': 'indicators_not_ready'})
+            missing = len(set(live) - seen)
+            if missing:
+                self.metrics.inc('skipped_tickers_total', {'reason': 'no_data'}, missing)
+        except Exception as e:
+            self.metrics.inc('errors_total', {'phase': 'download'})
+            print(f"Error descarregant dades: {e}")
+        return panel
+
+    def stale(self, panel, live, now):
+        # Amb el mercat tancat la finestra en cache no canvia: es reaprofita
+        # l'últim resultat mentre sigui el mateix DataFrame amb les mateixes espelmes tancades
+        cached = getattr(self.bar_cache, 'frames', {})
+        for ticker in self.tickers:
+            df = cached.get(ticker)
+            if ticker in live or df is None or df.empty:
+                self.stale_results.pop(ticker, None)
+                continue
+            closed = closed_bars(df, now)[0]
+            last = self.stale_results.get(ticker)
+            if last is None or last[0] is not df or last[1] != len(closed):
+                with self.metrics.timer('indicators'):
+                    last = self.stale_results[ticker] = (df, len(closed), self.process(ticker, closed))
+            panel.set(ticker, last[2], tradable=False)
+
+    def process(self, ticker, df):
+        base = self.indicators.get(TIMEFRAME)
+        if base is not None:
+            out = base.process(ticker, df)
+        else:
+            out = df.iloc[-2:].copy() if len(df) >= 2 else None
+        if out is None or not self.higher:
+            return out
+        for tf, frame in self.resampler.update(ticker, df).items():
+            extra = self.indicators[tf].process(ticker, frame)
+            for column in self.higher[tf]:
+                out[column] = extra[column].values if extra is not None else float('nan')
+        return out
+
+    def run_cycle(self):
+        panel = self.market_data()
+        for runner in self.runners:
+            start = time.perf_counter()
+            try:
+                runner.run_cycle(panel)
+            except Exception as e:
+                self.metrics.inc('errors_total', {'phase': 'cycle', 'strategy': runner.strategy.name})
+                print(f"Error background ({runner.strategy.name}): {e}")
+                # Descartem el cicle a mig fer: tornem a l'últim estat desat
+                runner.state, runner.portfolio, runner.ledger = runner.load()
+            self.metrics.observe('decision', time.perf_counter() - start)
+
+    def check_exits(self):
+        # Una sola baixada per la unió de tickers invertits (i amb mercat obert o acabat de tancar)
+        invested = active_tickers(sorted({t for runner in self.runners for t in runner.portfolio.entries()}),
+                                  self.clock.now())
+        frames = self.bar_cache.refresh(invested) if invested else {}
+        for runner in self.runners:
+            for ticker, price in runner.monitor.check(runner.portfolio.entries(), frames):
+                runner.on_exit(ticker, price)
+
+    def watch(self, seconds):
+        # Substitueix el time.sleep() del cicle complet
+        clock = self.clock
+        deadline = clock.monotonic() + seconds
+        while True:
+            remaining = deadline - clock.monotonic()
+            if remaining <= 0: return
+            clock.sleep(min(self.monitor_interval, remaining))
+            try:
+                with self.metrics.timer('monitor'):
+                    self.check_exits()
+            except Exception as e:
+                print(f"Error vigilant sortides: {e}")
+
+    # --- Arrencada en calent ---
+    def checkpoint(self):
+        if self.checkpoint_file is None:
+            return
+        payload = {
+            'indicators': {},
+            'resamplers': dict(self.resampler.resamplers),
+            'monitors': {r.strategy.name: (r.monitor.first_bar, r.monitor.checked) for r in self.runners},
+        }
+        for tf, engine in self.indicators.items():
+            with engine.lock:
+                payload['indicators'][tf] = dict(engine.sets)
+        with self.metrics.timer('checkpoint'):
+            checkpoint.save(self.checkpoint_file, self.specs, payload)
+
+    def restore(self):
+        if self.checkpoint_file is None:
+            return False
+        payload = checkpoint.load(self.checkpoint_file, self.specs, MAX_GAP.total_seconds())
+        if payload is None:
+            return False
+        for tf, sets in payload['indicators'].items():
+            if tf in self.indicators:
+                self.indicators[tf].sets.update(sets)
+        self.resampler.resamplers.update(payload['resamplers'])
+        for runner in self.runners:
+            first_bar, checked = payload['monitors'].get(runner.strategy.name, ({}, {}))
+            runner.monitor.first_bar.update(first_bar)
+            runner.monitor.checked.update(checked)
+        return True
+
+    def run(self, until=None):
+        # until: hora (UTC) on s'atura el bucle; en viu no s'atura mai
+        names = ", ".join(r.strategy.name for r in self.runners)
+        warm = self.restore()
+        print(f"🚀 MOTOR ARRENCAT ({names}) - {len(self.specs)} indicadors compartits, "
+              f"{'en calent (checkpoint)' if warm else 'en fred'}...")
+        # Primer les posicions obertes: es vigilen abans del primer cicle complet
+        try:
+            self.check_exits()
+        except Exception as e:
+            print(f"Error vigilant sortides: {e}")
+        while until is None or self.clock.now() < until:
+            with self.metrics.cycle(budget=CYCLE_SECONDS):
+                self.run_cycle()
+            self.checkpoint()
+            if self.metrics_file:
+                self.metrics.write(self.metrics_file)
+            # Fins al tancament de la pròxima espelma només es vigilen les posicions obertes
+            self.watch(seconds_to_next_bar(self.clock.now()))
+
+
+# ---------------------------------------------------------
+# UN SOL MOTOR PER MÀQUINA
+# ---------------------------------------------------------
+_ENGINE = {'thread': None, 'lock': None}
+_ENGINE_LOCK = threading.Lock()
+
+def _acquire_lock(path=LOCK_FILE):
+    # Bloqueig no bloquejant: si un altre procés ja té el motor, ens limitem a llegir
+    f = open(path, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def start_engine(strategies=None):
+    # Retorna True si el motor corre en aquest procés
+    if os.environ.get("BOT_ENGINE") == "external":
+        return False
+    with _ENGINE_LOCK:
+        if _ENGINE['thread'] is None:
+            lock = _acquire_lock()
+            if lock is None:
+                return False
+            engine = TradingEngine(strategies or list(STRATEGIES.values()))
+            if METRICS_PORT:
+                METRICS.serve(int(METRICS_PORT))
+            _ENGINE['lock'] = lock
+            _ENGINE['thread'] = threading.Thread(target=engine.run, name="trading-engine", daemon=True)
+            _ENGINE['thread'].start()
+        return True
+
+
+if __name__ == "__main__":
+    lock = _acquire_lock()
+    if lock is None:
+        raise SystemExit(f"El motor ja corre en un altre procés ({LOCK_FILE})")
+    if METRICS_PORT:
+        METRICS.serve(int(METRICS_PORT))
+    TradingEngine(list(STRATEGIES.values())).run()
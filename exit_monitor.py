@@ -0,0 +1,76 @@
+# ---------------------------------------------------------
+# VIGILÀNCIA RÀPIDA DE SORTIDES
+# ---------------------------------------------------------
+# Entre dos cicles complets (60 s), cada MONITOR_INTERVAL segons el motor
+# baixa només les espelmes noves dels tickers INVESTED i les passa a check():
+# l'última espelma (en formació) fa de cotització i els seus High/Low
+# indiquen si l'stop o l'objectiu s'han tocat dins l'espelma, no només al
+# tancament.
+#
+# De l'espelma d'entrada només es fa servir el Close: el seu High/Low és
+# d'abans de l'entrada. El motor la indica amb opened(); una posició
+# restaurada sense aquesta dada pren l'espelma on es veu per primer cop.
+
+MONITOR_INTERVAL = 5    # segons
+
+
+class ExitMonitor:
+    def __init__(self, leverage, target, stop, commission):
+        self.leverage = leverage
+        self.target = target
+        self.stop = stop
+        self.commission = commission
+        self.first_bar = {}     # ticker -> espelma d'entrada (o on s'ha vist la posició)
+        self.checked = {}       # ticker -> última espelma revisada
+
+    def opened(self, ticker, bar):
+        # bar: espelma (tancada) al preu de la qual s'ha entrat
+        self.first_bar[ticker] = bar
+        self.checked.pop(ticker, None)
+
+    def levels(self, entry_price):
+        # Preus on net_pnl_pct = -STOP / +TARGET, amb la mateixa fórmula que els bots:
+        # net_pnl_pct = LEVERAGE * (p / entry - 1) - LEVERAGE * COMMISSION_RATE
+        k = self.leverage
+        stop_price = entry_price * (1 + (k * self.commission - self.stop) / k)
+        target_price = entry_price * (1 + (k * self.commission + self.target) / k)
+        return stop_price, target_price
+
+    def _scan(self, ticker, df, entry_price):
+        first = self.first_bar.setdefault(ticker, df.index[-1])
+        since = max(first, self.checked.get(ticker, first))
+        bars = df[df.index >= since]
+        stop_price, target_price = self.levels(entry_price)
+
+        for ts, bar in zip(bars.index, bars.itertuples()):
+            fresh = ts > first
+            low = bar.Low if fresh else bar.Close
+            high = bar.High if fresh else bar.Close
+            # Si l'espelma toca els dos nivells, suposem el pitjor (stop)
+            if low <= stop_price:
+                return min(stop_price, bar.Open) if fresh else bar.Close
+            if high >= target_price:
+                return max(target_price, bar.Open) if fresh else bar.Close
+        self.checked[ticker] = bars.index[-1] if len(bars) else since
+        return None
+
+    def check(self, entries, frames):
+        # entries: {ticker: preu d'entrada} de les posicions obertes.
+        # Retorna [(ticker, preu de sortida)] per les posicions que han tocat nivell.
+        # frames: espelmes ja refrescades (diverses estratègies, una sola baixada)
+        invested = list(entries)
+        for ticker in list(self.first_bar):
+            if ticker not in invested:
+                self.first_bar.pop(ticker, None)
+                self.checked.pop(ticker, None)
+        if not invested:
+            return []
+
+        exits = []
+        for ticker in invested:
+            df = frames.get(ticker)
+            if df is None or df.empty: continue
+            price = self._scan(ticker, df, entries[ticker])
+            if price is not None:
+                exits.append((ticker, float(price)))
+        return exits
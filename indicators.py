@@ -0,0 +1,290 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# INDICADORS INCREMENTALS (O(1) PER ESPELMA)
+# ---------------------------------------------------------
+# Cada indicador guarda el seu estat (arrossegament EMA, suavitzat de Wilder,
+# línia senyal del MACD) i s'actualitza amb una sola espelma. Les fórmules
+# reprodueixen pandas_ta (ta.ema, ta.rsi, ta.adx, ta.macd):
+#   - EMA: llavor SMA de les primeres `length` espelmes, després alpha = 2/(n+1)
+#   - RMA (Wilder): ewm(alpha=1/n, adjust=True, min_periods=n), com ta.rma
+#     de pandas_ta 0.3; la 0.4 arrenca amb adjust=False i els RSI/ADX només
+#     difereixen a l'escalfament (< 1e-6 a les 300 espelmes, tests/test_indicators.py)
+#
+# update() consolida l'espelma a l'estat; peek() calcula el valor d'una
+# espelma que encara s'està formant sense tocar l'estat.
+
+
+def _nan(x):
+    return x is None or x != x
+
+
+class StreamingIndicator:
+    def __init__(self):
+        self.state = self._initial_state()
+        self.value = None
+
+    def update(self, high, low, close):
+        if _nan(high) or _nan(low) or _nan(close):
+            return self.value
+        self.state, self.value = self._step(self.state, high, low, close)
+        return self.value
+
+    def peek(self, high, low, close):
+        if _nan(high) or _nan(low) or _nan(close):
+            return self.value
+        return self._step(self.state, high, low, close)[1]
+
+    def seed(self, df):
+        # Escalfament amb l'històric (columnes High, Low, Close)
+        for high, low, close in zip(df['High'].values, df['Low'].values, df['Close'].values):
+            self.update(float(high), float(low), float(close))
+        return self.value
+
+
+def _ema_step(state, x, length, alpha):
+    n, total, value = state
+    if _nan(x):
+        return state, value
+    n += 1
+    if n < length:
+        return (n, total + x, None), None
+    if n == length:
+        value = (total + x) / length
+    else:
+        value = value + alpha * (x - value)
+    return (n, total, value), value
+
+
+def _rma_step(state, x, length, decay):
+    nobs, num, den = state
+    if _nan(x):
+        # pandas (ignore_na=False): els pesos antics també decauen
+        if nobs > 0:
+            num, den = num * decay, den * decay
+    else:
+        num = x + decay * num
+        den = 1.0 + decay * den
+        nobs += 1
+    value = num / den if nobs >= length else None
+    return (nobs, num, den), value
+
+
+class EMA(StreamingIndicator):
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        super().__init__()
+
+    def _initial_state(self):
+        return (0, 0.0, None)
+
+    def _step(self, state, high, low, close):
+        return _ema_step(state, close, self.length, self.alpha)
+
+
+class RSI(StreamingIndicator):
+    def __init__(self, length=14):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        super().__init__()
+
+    def _initial_state(self):
+        return (None, (0, 0.0, 0.0), (0, 0.0, 0.0))
+
+    def _step(self, state, high, low, close):
+        prev_close, pos_state, neg_state = state
+        if prev_close is None:
+            return (close, pos_state, neg_state), None
+
+        diff = close - prev_close
+        pos_state, pos_avg = _rma_step(pos_state, max(diff, 0.0), self.length, self.decay)
+        neg_state, neg_avg = _rma_step(neg_state, max(-diff, 0.0), self.length, self.decay)
+
+        value = None
+        if pos_avg is not None and neg_avg is not None and pos_avg + neg_avg > 0:
+            value = 100.0 * pos_avg / (pos_avg + neg_avg)
+        return (close, pos_state, neg_state), value
+
+
+class ADX(StreamingIndicator):
+    def __init__(self, length=14):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        super().__init__()
+
+    def _initial_state(self):
+        empty = (0, 0.0, 0.0)
+        return (None, empty, empty, empty, empty)
+
+    def _step(self, state, high, low, close):
+        prev, tr_state, pos_state, neg_state, dx_state = state
+        if prev is None:
+            return ((high, low, close), tr_state, pos_state, neg_state, dx_state), None
+
+        prev_high, prev_low, prev_close = prev
+        tr = max(high - low, abs(high - prev_close), abs(prev_close - low))
+        up = high - prev_high
+        dn = prev_low - low
+        pos = up if (up > dn and up > 0) else 0.0
+        neg = dn if (dn > up and dn > 0) else 0.0
+
+        tr_state, atr = _rma_step(tr_state, tr, self.length, self.decay)
+        pos_state, pos_avg = _rma_step(pos_state, pos, self.length, self.decay)
+        neg_state, neg_avg = _rma_step(neg_state, neg, self.length, self.decay)
+
+        # DX = 100 * |DM+ - DM-| / (DM+ + DM-); el factor 100/ATR es cancel·la
+        dx = None
+        if atr and pos_avg is not None and neg_avg is not None and pos_avg + neg_avg > 0:
+            dx = 100.0 * abs(pos_avg - neg_avg) / (pos_avg + neg_avg)
+        dx_state, value = _rma_step(dx_state, dx, self.length, self.decay)
+        return ((high, low, close), tr_state, pos_state, neg_state, dx_state), value
+
+
+class MACD(StreamingIndicator):
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.lengths = (fast, slow, signal)
+        self.alphas = tuple(2.0 / (n + 1) for n in self.lengths)
+        super().__init__()
+
+    def _initial_state(self):
+        return ((0, 0.0, None), (0, 0.0, None), (0, 0.0, None))
+
+    def _step(self, state, high, low, close):
+        fast_state, slow_state, sig_state = state
+        fast_state, fast = _ema_step(fast_state, close, self.lengths[0], self.alphas[0])
+        slow_state, slow = _ema_step(slow_state, close, self.lengths[1], self.alphas[1])
+        if fast is None or slow is None:
+            return (fast_state, slow_state, sig_state), None
+
+        macd = fast - slow
+        sig_state, signal = _ema_step(sig_state, macd, self.lengths[2], self.alphas[2])
+        if signal is None:
+            return (fast_state, slow_state, sig_state), None
+        return (fast_state, slow_state, sig_state), (macd, signal)
+
+
+# ---------------------------------------------------------
+# CONJUNT D'INDICADORS PER TICKER
+# ---------------------------------------------------------
+# specs: {'EMA_50': EMA(50), ('MACD', 'MACD_SIG'): MACD(12, 26, 9), ...}
+# Una clau tupla reparteix un valor compost en diverses columnes.
+
+class IndicatorSet:
+    def __init__(self, specs, partial=False):
+        # partial=True: els indicadors encara freds surten com a NaN en lloc
+        # d'anul·lar tota la fila (pipeline compartit entre estratègies)
+        self.specs = specs
+        self.partial = partial
+        self.last_ts = None
+        self.prev_row = None
+
+    def _values(self, method, high, low, close):
+        # Tots els indicadors avancen encara que algun no estigui escalfat
+        values = [(key, getattr(indicator, method)(high, low, close))
+                  for key, indicator in self.specs.items()]
+        row = {}
+        for key, value in values:
+            if value is None:
+                if not self.partial:
+                    return None
+                value = (float('nan'),) * len(key) if isinstance(key, tuple) else float('nan')
+            if isinstance(key, tuple):
+                row.update(zip(key, value))
+            else:
+                row[key] = value
+        return row
+
+    def process(self, df):
+        # Consolidem només les espelmes tancades que encara no hem vist;
+        # l'última (en formació) es calcula amb peek()
+        if df is None or len(df) < 2:
+            return None
+        index, n = df.index, len(df) - 1
+        high, low, close = df['High'].values, df['Low'].values, df['Close'].values
+        # Índex ordenat: searchsorted en lloc de filtrar tota la finestra a cada cicle
+        start = 0 if self.last_ts is None else min(n, int(index.searchsorted(self.last_ts, side='right')))
+
+        for k in range(start, n):
+            values = self._values('update', float(high[k]), float(low[k]), float(close[k]))
+        if start < n:
+            self.last_ts = index[n - 1]
+            self.prev_row = (self.last_ts, values)
+
+        curr = self._values('peek', float(high[-1]), float(low[-1]), float(close[-1]))
+        if curr is None or self.prev_row is None or self.prev_row[1] is None:
+            return None
+
+        prev_ts, prev = self.prev_row
+        if prev_ts != df.index[-2]:
+            return None
+        # Un sol DataFrame nou: afegir les columnes d'una en una és el més car del cicle
+        names = list(curr)
+        values = np.column_stack([df.iloc[-2:].to_numpy(dtype=float),
+                                  [[prev[c] for c in names], [curr[c] for c in names]]])
+        return pd.DataFrame(values, index=index[-2:], columns=list(df.columns) + names)
+
+
+class IndicatorEngine:
+    def __init__(self, factory, partial=False):
+        # factory() -> specs nous per cada ticker
+        self.factory = factory
+        self.partial = partial
+        self.sets = {}
+        self.lock = threading.Lock()
+
+    def process(self, ticker, df):
+        with self.lock:
+            if ticker not in self.sets:
+                self.sets[ticker] = IndicatorSet(self.factory(), self.partial)
+            return self.sets[ticker].process(df)
+
+
+# ---------------------------------------------------------
+# VERSIÓ VECTORIAL (BACKTEST)
+# ---------------------------------------------------------
+# Mateixes fórmules sobre una sèrie sencera (pandas ewm), per quan tenim
+# tot l'històric de cop. Coincideixen amb les classes incrementals.
+
+def ema_series(close, length):
+    close = close.astype(float).copy()
+    if len(close) < length:
+        return pd.Series(np.nan, index=close.index)
+    sma = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan
+    close.iloc[length - 1] = sma
+    return close.ewm(span=length, adjust=False).mean()
+
+def rma_series(x, length):
+    return x.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+def rsi_series(close, length=14):
+    diff = close.astype(float).diff()
+    pos_avg = rma_series(diff.clip(lower=0), length)
+    neg_avg = rma_series((-diff).clip(lower=0), length)
+    return 100.0 * pos_avg / (pos_avg + neg_avg)
+
+def adx_series(high, low, close, length=14):
+    prev_close = close.shift(1)
+    tr = pd.concat([high - low, (high - prev_close).abs(), (prev_close - low).abs()], axis=1).max(axis=1, skipna=False)
+    up = high - high.shift(1)
+    dn = low.shift(1) - low
+    pos = up.where((up > dn) & (up > 0), 0.0).where(up.notna())
+    neg = dn.where((dn > up) & (dn > 0), 0.0).where(dn.notna())
+
+    atr = rma_series(tr, length)
+    pos_avg = rma_series(pos, length).where(atr.notna())
+    neg_avg = rma_series(neg, length).where(atr.notna())
+    dx = 100.0 * (pos_avg - neg_avg).abs() / (pos_avg + neg_avg)
+    return rma_series(dx, length)
+
+def macd_series(close, fast=12, slow=26, signal=9):
+    macd = ema_series(close, fast) - ema_series(close, slow)
+    first = macd.first_valid_index()
+    if first is None:
+        return macd, macd
+    sig = ema_series(macd.loc[first:], signal).reindex(macd.index)
+    return macd.where(sig.notna()), sig
@@ -0,0 +1,98 @@
+import math
+import re
+import time
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# LLIBRE DE TRADES
+# ---------------------------------------------------------
+# L'historial complet viu a la base de dades (la interfície el llegeix
+# d'allà); el motor no en guarda cap còpia en memòria. Les estadístiques
+# (win rate, esperança, profit factor, drawdown màxim) s'actualitzen en O(1)
+# per trade, globals i per ticker, i es desen amb l'estat: cap informe ha de
+# tornar a recórrer l'historial.
+
+COLUMNS = ['Time', 'Ticker', 'Res', 'PL', 'PL_pct']
+
+
+class RunningStats:
+    FIELDS = ('trades', 'wins', 'net_pnl', 'gross_profit', 'gross_loss', 'peak', 'max_drawdown')
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field, 0))
+
+    def update(self, pnl, win):
+        self.trades += 1
+        self.wins += 1 if win else 0
+        self.net_pnl += pnl
+        if pnl >= 0:
+            self.gross_profit += pnl
+        else:
+            self.gross_loss -= pnl
+        # Drawdown sobre el P&L acumulat (en $)
+        self.peak = max(self.peak, self.net_pnl)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.net_pnl)
+
+    @property
+    def losses(self):
+        return self.trades - self.wins
+
+    @property
+    def win_rate(self):
+        return self.wins / self.trades if self.trades else 0.0
+
+    @property
+    def expectancy(self):
+        return self.net_pnl / self.trades if self.trades else 0.0
+
+    @property
+    def profit_factor(self):
+        if self.gross_loss:
+            return self.gross_profit / self.gross_loss
+        return math.inf if self.gross_profit else 0.0
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def report(self):
+        return {'trades': self.trades, 'wins': self.wins, 'losses': self.losses,
+                'win_rate': self.win_rate, 'net_pnl': self.net_pnl, 'expectancy': self.expectancy,
+                'profit_factor': self.profit_factor, 'max_drawdown': self.max_drawdown}
+
+
+class TradeLedger:
+    def __init__(self, stats=None):
+        stats = stats or {}
+        self.total = RunningStats(**stats.get('total', {}))
+        self.by_ticker = {t: RunningStats(**s) for t, s in stats.get('by_ticker', {}).items()}
+
+    def add(self, ticker, pnl, pnl_pct, win, ts=None):
+        ts = time.time() if ts is None else ts
+        self.total.update(pnl, win)
+        self.by_ticker.setdefault(ticker, RunningStats()).update(pnl, win)
+        return {'Time': ts, 'Ticker': ticker, 'Res': 'WIN' if win else 'LOSS', 'PL': pnl, 'PL_pct': pnl_pct}
+
+    def stats(self):
+        return {'total': self.total.to_dict(),
+                'by_ticker': {t: s.to_dict() for t, s in self.by_ticker.items()}}
+
+
+def summary(stats):
+    # Taula per ticker + total a partir de les estadístiques desades
+    stats = stats or {}
+    rows = {t: RunningStats(**s).report() for t, s in sorted(stats.get('by_ticker', {}).items())}
+    rows['TOTAL'] = RunningStats(**stats.get('total', {})).report()
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+_MONEY = re.compile(r'^\s*([+-]?\d+(?:\.\d+)?)\$(?:\s*\(([+-]?\d+(?:\.\d+)?)%\))?')
+
+def parse_legacy(entry, ts=0.0):
+    # {'Ticker', 'Res', 'PL': "+12.34$ (0.85%)"} -> fila numèrica
+    m = _MONEY.match(str(entry.get('PL', '')))
+    pnl = float(m.group(1)) if m else 0.0
+    pnl_pct = float(m.group(2)) / 100 if m and m.group(2) else math.nan
+    return {'Time': ts, 'Ticker': entry.get('Ticker', '?'), 'Res': entry.get('Res', 'LOSS'),
+            'PL': pnl, 'PL_pct': pnl_pct}
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from metrics import METRICS
+
+# ---------------------------------------------------------
+# CACHE INCREMENTAL D'ESPELMES (OHLCV)
+# ---------------------------------------------------------
+# El primer cicle fa un backfill complet de 5 dies. Els següents només
+# baixen les espelmes des de l'última que ja tenim (inclosa, perquè l'última
+# espelma d'1m encara s'està formant), les fusionen i retallen la finestra.
+#
+# Amb un BarStore (bar_store.py) les espelmes tancades es van afegint a disc,
+# i un procés nou comença des del disc i només baixa el forat des de
+# l'última espelma desada.
+
+INTERVAL = "1m"
+BACKFILL_DAYS = 5
+BACKFILL_PERIOD = f"{BACKFILL_DAYS}d"
+MAX_BARS = 7200             # 5 dies de 1m en un mercat 24/7 (BTC-USD)
+# Un forat més llarg que el backfill es torna a baixar sencer (Yahoo no
+# serveix 1m més enllà de ~7 dies); mai més gran que BACKFILL_PERIOD
+MAX_GAP = pd.Timedelta(days=BACKFILL_DAYS)
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Univers gran: els tickers es reparteixen en lots que es baixen en paral·lel
+SHARD_SIZE = 25
+MAX_WORKERS = 8
+RATE_LIMIT = 20.0           # peticions/s al proveïdor (una per ticker)
+RETRIES = 2
+BACKOFF = 1.0               # segons; es dobla a cada reintent
+
+
+def load_universe(default, path=None):
+    # TICKERS_FILE: un símbol per línia (# per comentaris) per escombrar
+    # centenars de tickers sense tocar el codi
+    path = path or os.environ.get("TICKERS_FILE")
+    if not path or not os.path.exists(path):
+        return list(default)
+    with open(path) as f:
+        symbols = [line.split('#')[0].strip() for line in f]
+    return list(dict.fromkeys(s for s in symbols if s)) or list(default)
+
+
+class RateLimiter:
+    # Cubell de fitxes compartit per tots els fils de descàrrega
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BarCache:
+    def __init__(self, max_bars=MAX_BARS, interval=INTERVAL, backfill_period=BACKFILL_PERIOD,
+                 shard_size=SHARD_SIZE, max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT,
+                 retries=RETRIES, backoff=BACKOFF, store=None, metrics=METRICS):
+        self.max_bars = max_bars
+        self.interval = interval
+        self.backfill_period = backfill_period
+        self.shard_size = shard_size
+        self.retries = retries
+        self.backoff = backoff
+        self.frames = {}
+        self.lock = threading.Lock()
+        self.limiter = RateLimiter(rate_limit)
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="bars")
+        self.store = store          # BarStore opcional (històric a disc)
+        self.metrics = metrics
+
+    def last_timestamp(self, ticker):
+        df = self.frames.get(ticker)
+        if df is None or df.empty:
+            return None
+        return df.index[-1]
+
+    def _download_one(self, ticker, **kwargs):
+        # Ticker.history no comparteix estat global (yf.download sí: no es pot
+        # cridar des de diversos fils alhora). Fa la mateixa petició per ticker.
+        # Import diferit: una arrencada en calent no el necessita fins al primer forat
+        import yfinance as yf
+        self.limiter.acquire()
+        df = yf.Ticker(ticker).history(interval=self.interval, auto_adjust=True, actions=False,
+                                       raise_errors=True, **kwargs)
+        return df[[c for c in OHLCV if c in df.columns]].dropna()
+
+    def _download(self, tickers, **kwargs):
+        # Un símbol dolent no tomba el lot; només si fallen tots (xarxa,
+        # límit del proveïdor) es llença l'error perquè es reintenti
+        frames, errors = {}, []
+        for ticker in tickers:
+            try:
+                df = self._download_one(ticker, **kwargs)
+            except Exception as e:
+                errors.append(e)
+                continue
+            if not df.empty:
+                frames[ticker] = df
+        if errors and len(errors) == len(tickers):
+            raise errors[0]
+        return frames
+
+    def _fetch_shard(self, shard, **kwargs):
+        # Un lot que falla es reintenta amb espera creixent; si no se'n surt
+        # només perd aquest lot, la resta del cicle continua
+        for attempt in range(self.retries + 1):
+            try:
+                return self._download(shard, **kwargs)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def _merge(self, ticker, new_df):
+        old = self.frames.get(ticker)
+        if old is not None and not old.empty:
+            # L'última espelma antiga pot haver canviat: ens quedem amb la nova
+            merged = pd.concat([old, new_df])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        else:
+            merged = new_df.sort_index()
+        self.frames[ticker] = merged.iloc[-self.max_bars:]
+
+    def _load_stored(self, ticker, now):
+        # Arrencada: les últimes max_bars del disc si no són massa velles
+        if self.store is None:
+            return
+        last = self.store.last_timestamp(ticker)
+        if last is None or now - last > MAX_GAP:
+            return
+        self.frames[ticker] = self.store.frame(ticker, last=self.max_bars)
+
+    def _persist(self, ticker):
+        # Només les tancades: l'última espelma encara es pot moure
+        if self.store is None:
+            return
+        try:
+            self.store.append(ticker, self.frames[ticker].iloc[:-1])
+        except OSError as e:
+            print(f"Error desant espelmes de {ticker}: {e}")
+
+    def _plan(self, tickers):
+        # Lots de backfill (tickers nous o massa vells) i de delta, cadascun
+        # amb el seu `since`: un ticker endarrerit no arrossega tot l'univers
+        now = pd.Timestamp.now(tz='UTC')
+        backfill, delta = [], []
+        with self.lock:
+            for ticker in tickers:
+                if ticker not in self.frames:
+                    self._load_stored(ticker, now)
+                last = self.last_timestamp(ticker)
+                if last is not None and last.tzinfo is None:
+                    last = last.tz_localize('UTC')
+                if last is None or now - last > MAX_GAP:
+                    backfill.append(ticker)
+                else:
+                    delta.append((self.last_timestamp(ticker), ticker))
+        delta.sort(key=lambda x: x[0])
+
+        jobs = []
+        for i in range(0, len(backfill), self.shard_size):
+            jobs.append((backfill[i:i + self.shard_size], {'period': self.backfill_period}))
+        for i in range(0, len(delta), self.shard_size):
+            shard = delta[i:i + self.shard_size]
+            jobs.append(([t for _, t in shard], {'start': shard[0][0]}))
+        return jobs
+
+    def refresh_iter(self, tickers):
+        # Genera {ticker: df} per cada lot tan bon punt arriba, per poder
+        # calcular indicadors mentre els altres lots encara es baixen
+        futures = {self.pool.submit(self._fetch_shard, shard, **kwargs): (shard, 'period' in kwargs)
+                   for shard, kwargs in self._plan(tickers)}
+        for future in as_completed(futures):
+            shard, is_backfill = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"Error baixant lot ({len(shard)} tickers, {shard[0]}...): {e}")
+                data = {}
+
+            with self.lock:
+                for ticker in shard:
+                    df = data.get(ticker)
+                    if df is None:
+                        # El cicle continua amb l'espelma que hi hagi en cache
+                        self.metrics.inc('skipped_tickers_total', {'reason': 'download_failed'})
+                        continue
+                    if is_backfill:
+                        self.frames[ticker] = df.iloc[-self.max_bars:]
+                    else:
+                        self._merge(ticker, df)
+                    self._persist(ticker)
+                # Si el lot falla retornem el que ja teníem en cache
+                frames = {t: self.frames[t] for t in shard if t in self.frames}
+            yield frames
+
+    def refresh(self, tickers):
+        frames = {}
+        for shard in self.refresh_iter(tickers):
+            frames.update(shard)
+        return {t: frames[t] for t in tickers if t in frames}
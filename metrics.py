@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# MÈTRIQUES DEL CICLE (FORMAT PROMETHEUS)
+# ---------------------------------------------------------
+# Cada fase del cicle (descàrrega, indicadors, decisió, persistència,
+# Telegram, render) es cronometra amb METRICS.timer('fase'). Per fase es
+# guarda un histograma de buckets fixos (el que llegeix Prometheus) i una
+# finestra de les últimes mostres per calcular percentils: memòria fitada
+# encara que el bot corri mesos.
+#
+# Export: write() desa un fitxer .prom (textfile collector) i serve() obre
+# un endpoint /metrics opcional.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WINDOW = 512            # mostres recents per fase (percentils)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # l'últim és +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        return float(np.percentile(np.fromiter(self.recent, float), q))
+
+
+def _labels(labels):
+    return tuple(sorted((labels or {}).items()))
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Metrics:
+    def __init__(self, prefix="bot"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}    # fase -> Histogram
+        self.counters = {}      # (nom, etiquetes) -> valor
+        self.gauges = {}        # (nom, etiquetes) -> valor
+        self.server = None
+
+    # --- Registre ---
+    def observe(self, phase, seconds):
+        with self.lock:
+            if phase not in self.histograms:
+                self.histograms[phase] = Histogram()
+            self.histograms[phase].observe(seconds)
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    @contextmanager
+    def cycle(self, budget):
+        # Com timer('cycle'), però compta els cicles que passen del pressupost
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_cycle(time.perf_counter() - start, budget)
+
+    def record_cycle(self, elapsed, budget):
+        self.observe('cycle', elapsed)
+        self.inc('cycles_total')
+        self.set('last_cycle_timestamp_seconds', time.time())
+        if elapsed > budget:
+            self.inc('cycle_overruns_total')
+
+    def inc(self, name, labels=None, n=1):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def set(self, name, value, labels=None):
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    # --- Lectura ---
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self.lock:
+            if self.histograms:
+                lines += [f"# TYPE {p}_phase_seconds histogram"]
+            for phase, h in sorted(self.histograms.items()):
+                label = (('phase', phase),)
+                cumulative = 0
+                for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{p}_phase_seconds_bucket{_fmt_labels(label, (('le', bound),))} {cumulative}")
+                lines.append(f"{p}_phase_seconds_sum{_fmt_labels(label)} {h.sum}")
+                lines.append(f"{p}_phase_seconds_count{_fmt_labels(label)} {h.count}")
+            for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({n for n, _ in values}):
+                    lines.append(f"# TYPE {p}_{name} {kind}")
+                    for (n, labels), value in sorted(values.items()):
+                        if n == name:
+                            lines.append(f"{p}_{name}{_fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Taula per al panell del dashboard (temps en ms)
+        with self.lock:
+            rows = {phase: {'count': h.count,
+                            'p50_ms': h.percentile(50) * 1000,
+                            'p95_ms': h.percentile(95) * 1000,
+                            'p99_ms': h.percentile(99) * 1000,
+                            'max_ms': max(h.recent) * 1000 if h.recent else 0.0,
+                            'last_ms': h.recent[-1] * 1000 if h.recent else 0.0}
+                    for phase, h in sorted(self.histograms.items())}
+            counters = {f"{name}{_fmt_labels(labels)}": value
+                        for (name, labels), value in sorted(self.counters.items())}
+        return pd.DataFrame.from_dict(rows, orient='index'), counters
+
+    # --- Export ---
+    def write(self, path):
+        # Escriptura atòmica: el collector mai llegeix un fitxer a mig escriure
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error desant mètriques: {e}")
+
+    def serve(self, port, host="0.0.0.0"):
+        if self.server is not None:
+            return self.server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        return self.server
+
+
+# Un registre per procés (el mòdul es carrega un sol cop encara que
+# Streamlit torni a executar l'script)
+METRICS = Metrics()
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ---------------------------------------------------------
+# NOTIFICACIONS TELEGRAM EN SEGON PLA
+# ---------------------------------------------------------
+# send() només posa el missatge en una cua limitada i torna de seguida: el
+# bucle de trading mai espera la xarxa. Un fil de fons agafa el primer
+# missatge, espera `linger` segons per recollir la resta del mateix cicle i
+# els envia junts en un sol missatge amb una Session reutilitzada (keep-alive).
+
+API_URL = "https://api.telegram.org"
+MAX_TEXT = 4096                 # Límit de Telegram per missatge
+TIMEOUT = (3.05, 10)            # (connexió, lectura) en segons
+RETRYABLE = {429, 500, 502, 503, 504}
+
+
+class TelegramNotifier:
+    def __init__(self, token, chat_id, prefix="", api_url=API_URL, max_queue=200,
+                 linger=0.5, retries=3, backoff=1.0, timeout=TIMEOUT, metrics=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.prefix = prefix
+        self.url = f"{api_url}/bot{token}/sendMessage"
+        self.linger = linger
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self.thread = None
+        if self.enabled:
+            self.thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self.thread.start()
+
+    @property
+    def enabled(self):
+        return bool(self.token and self.chat_id)
+
+    def send(self, msg):
+        if not self.enabled: return False
+        try:
+            self.queue.put_nowait(msg)
+            return True
+        except queue.Full:
+            # Millor perdre un avís que bloquejar el cicle
+            self.dropped += 1
+            if self.metrics: self.metrics.inc('notifier_dropped_total')
+            return False
+
+    def close(self, timeout=5.0):
+        # Envia el que quedi a la cua i atura el fil
+        if self.thread is None: return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.session.close()
+
+    # --- Fil de fons ---
+    def _collect(self, first):
+        batch, stop = [first], False
+        deadline = time.monotonic() + self.linger
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                msg = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if msg is None:
+                stop = True
+                break
+            batch.append(msg)
+        return batch, stop
+
+    def _pieces(self, msg, room):
+        # Un missatge massa llarg es parteix per línies; una línia massa llarga, a trossos
+        if len(msg) <= room:
+            yield msg
+            return
+        text = ""
+        for line in msg.split("\n"):
+            while len(line) > room:
+                if text:
+                    yield text
+                    text = ""
+                yield line[:room]
+                line = line[room:]
+            candidate = f"{text}\n{line}" if text else line
+            if len(candidate) > room:
+                yield text
+                candidate = line
+            text = candidate
+        if text:
+            yield text
+
+    def _chunks(self, batch):
+        # Ajunta els missatges sense passar del límit de Telegram
+        head = f"{self.prefix}\n" if self.prefix else ""
+        room = MAX_TEXT - len(head)
+        text = ""
+        for msg in batch:
+            for piece in self._pieces(msg, room):
+                candidate = f"{text}\n\n{piece}" if text else piece
+                if text and len(candidate) > room:
+                    yield head + text
+                    candidate = piece
+                text = candidate
+        if text:
+            yield head + text
+
+    def _post(self, text):
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "Markdown"}
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            try:
+                r = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if r.status_code == 200:
+                    self.sent += 1
+                    return True
+                if r.status_code not in RETRYABLE:
+                    break
+                if r.status_code == 429:
+                    try:
+                        delay = max(delay, float(r.json()['parameters']['retry_after']))
+                    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+                        # Sense retry_after llegible: es reintenta amb el backoff normal
+                        print(f"Telegram 429 sense retry_after vàlid: {e!r}")
+                        if self.metrics: self.metrics.inc('notifier_errors_total', {'kind': 'retry_after'})
+            except requests.RequestException as e:
+                if self.metrics: self.metrics.inc('notifier_errors_total', {'kind': type(e).__name__})
+            if attempt < self.retries:
+                time.sleep(delay)
+        self.failed += 1
+        return False
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None: return
+            batch, stop = self._collect(first)
+            for text in self._chunks(batch):
+                start = time.perf_counter()
+                ok = self._post(text)
+                if self.metrics:
+                    self.metrics.observe('telegram', time.perf_counter() - start)
+                    if not ok: self.metrics.inc('notifier_failed_total')
+            if stop: return
@@ -0,0 +1,209 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import DEFAULT_PARAMS, FIELDS, load_frames, signal_panel, simulate, strength_panel, summarize
+
+# ---------------------------------------------------------
+# 1. ESPAI DE PARÀMETRES
+# ---------------------------------------------------------
+GRIDS = {
+    'balanced': {
+        'TARGET_NET_PROFIT': [0.005, 0.0085, 0.012, 0.02],
+        'STOP_LOSS_PCT': [0.005, 0.0085, 0.012, 0.02],
+        'LEVERAGE': [1, 3, 5],
+        'EMA_FAST': [20, 50, 100],
+        'RSI_LENGTH': [7, 14, 21],
+        'ADX_LENGTH': [14],
+        'ADX_MIN': [15, 20, 25],
+    },
+    'sniper': {
+        'TARGET_NET_PROFIT': [0.005, 0.0085, 0.012, 0.02],
+        'STOP_LOSS_PCT': [0.005, 0.0085, 0.012, 0.02],
+        'LEVERAGE': [1, 3, 5],
+        'EMA_SLOW': [100, 200, 300],
+        'MACD_FAST': [8, 12],
+        'MACD_SLOW': [21, 26],
+        'MACD_SIGNAL': [9],
+    },
+}
+
+# Paràmetres que canvien els senyals d'entrada. Els altres (objectiu, stop,
+# palanquejament) només afecten la simulació i reutilitzen el mateix senyal.
+SIGNAL_KEYS = {
+    'balanced': ('EMA_FAST', 'RSI_LENGTH', 'ADX_LENGTH', 'ADX_MIN'),
+    'sniper': ('EMA_SLOW', 'MACD_FAST', 'MACD_SLOW', 'MACD_SIGNAL'),
+}
+
+def grid(space):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+def sample(space, n, seed=0):
+    # Combinacions diferents de la graella (sense reemplaçament), sense
+    # construir-la: cada índex es descompon en un valor per paràmetre
+    sizes = [len(v) for v in space.values()]
+    total = int(np.prod(sizes, dtype=object))
+    picks = np.random.default_rng(seed).choice(total, min(n, total), replace=False)
+    out = []
+    for flat in picks.tolist():
+        params = {}
+        for (key, values), size in zip(reversed(space.items()), reversed(sizes)):
+            flat, pos = divmod(flat, size)
+            params[key] = values[pos]
+        out.append({k: params[k] for k in space})
+    return out
+
+# ---------------------------------------------------------
+# 2. PREUS A MEMÒRIA COMPARTIDA
+# ---------------------------------------------------------
+# El procés principal alinea Open/High/Low/Close en un panell (tickers x espelmes)
+# i el copia un sol cop a memòria compartida. Els workers s'hi connecten a
+# l'arrencada; cada tasca només porta els diccionaris de paràmetres.
+
+CLOSE = FIELDS.index('Close')
+
+def share_panel(frames):
+    tickers = list(frames)
+    frames = {t: frames[t].dropna() for t in tickers}
+    index = frames[tickers[0]].index
+    for ticker in tickers[1:]:
+        index = index.union(frames[ticker].index)
+
+    blocks, meta = [], {'tickers': tickers, 'shape': (len(FIELDS), len(tickers), len(index))}
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(meta['shape'])) * 8)
+    panel = np.ndarray(meta['shape'], dtype=np.float64, buffer=shm.buf)
+    panel[:] = np.nan
+    for j, ticker in enumerate(tickers):
+        pos = index.get_indexer(frames[ticker].index)
+        for f, field in enumerate(FIELDS):
+            panel[f, j, pos] = frames[ticker][field].values
+    blocks.append(shm)
+    meta['panel'] = shm.name
+
+    stamps = shared_memory.SharedMemory(create=True, size=max(len(index), 1) * 8)
+    np.ndarray((len(index),), dtype=np.int64, buffer=stamps.buf)[:] = index.as_unit('ns').asi8
+    blocks.append(stamps)
+    meta['index'] = stamps.name
+    meta['tz'] = str(index.tz) if index.tz is not None else None
+    return blocks, meta
+
+_WORKER = {}
+
+def _init_worker(meta, strategy):
+    # Els workers només s'hi connecten; el procés principal la desvincula
+    panel_shm = shared_memory.SharedMemory(name=meta['panel'])
+    index_shm = shared_memory.SharedMemory(name=meta['index'])
+    shape = meta['shape']
+    panel = np.ndarray(shape, dtype=np.float64, buffer=panel_shm.buf)
+    stamps = np.ndarray((shape[2],), dtype=np.int64, buffer=index_shm.buf)
+    index = pd.DatetimeIndex(stamps.view('datetime64[ns]'))
+    if meta['tz']:
+        index = index.tz_localize('UTC').tz_convert(meta['tz'])
+
+    frames = {}
+    for j, ticker in enumerate(meta['tickers']):
+        valid = ~np.isnan(panel[CLOSE, j])
+        frames[ticker] = pd.DataFrame({field: panel[f, j, valid] for f, field in enumerate(FIELDS)},
+                                      index=index[valid])
+    _WORKER.update(blocks=(panel_shm, index_shm), index=index, frames=frames,
+                   prices=panel, strategy=strategy, caches={}, signal=(None, None, None))
+
+# ---------------------------------------------------------
+# 3. AVALUACIÓ
+# ---------------------------------------------------------
+def evaluate(params):
+    w = _WORKER
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    key = tuple(p[k] for k in SIGNAL_KEYS[w['strategy']])
+    # Només el senyal del grup actual: chunks() ja agrupa els jocs per senyal,
+    # i guardar-los tots fa créixer cada worker sense límit
+    if w['signal'][0] != key:
+        w['signal'] = (key, signal_panel(w['frames'], w['index'], w['strategy'], p, w['caches']),
+                       strength_panel(w['frames'], w['index'], w['strategy'], p, w['caches']))
+    _, signal, strength = w['signal']
+    result = simulate(w['index'], list(w['frames']), w['prices'], signal, p, strength)
+    return {**params, **summarize(result, p)}
+
+def _run_chunk(chunk):
+    return [evaluate(params) for params in chunk]
+
+def chunks(param_sets, strategy, workers, size=16):
+    # Agrupem per senyal perquè els jocs que el comparteixen vagin al mateix
+    # worker i trobin els indicadors ja a la cache
+    keys = SIGNAL_KEYS[strategy]
+    groups = {}
+    for params in param_sets:
+        p = {**DEFAULT_PARAMS, **params}
+        groups.setdefault(tuple(p[k] for k in keys), []).append(params)
+    size = max(1, min(size, len(param_sets) // (workers * 4) or 1))
+    out = []
+    for group in groups.values():
+        out += [group[i:i + size] for i in range(0, len(group), size)]
+    # Primer els trossos grans per repartir millor la feina
+    return sorted(out, key=len, reverse=True)
+
+def sweep(frames, strategy='balanced', param_sets=None, workers=None):
+    param_sets = param_sets if param_sets is not None else grid(GRIDS[strategy])
+    workers = workers or os.cpu_count() or 1
+    blocks, meta = share_panel(frames)
+    try:
+        if workers == 1:
+            _init_worker(meta, strategy)
+            rows = [evaluate(params) for params in param_sets]
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(meta, strategy)) as pool:
+                rows = [row for rows in pool.map(_run_chunk, chunks(param_sets, strategy, workers))
+                        for row in rows]
+    finally:
+        _WORKER.clear()
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return rank(rows)
+
+def rank(rows):
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    return table.sort_values(['net_pnl', 'max_drawdown'], ascending=[False, False]).reset_index(drop=True)
+
+# ---------------------------------------------------------
+# 4. LÍNIA D'ORDRES
+# ---------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Escombrat de paràmetres en paral·lel sobre el backtest")
+    parser.add_argument('data', help="Carpeta amb un CSV d'espelmes 1m per ticker, o un BarStore")
+    parser.add_argument('--strategy', choices=sorted(GRIDS), default='balanced')
+    parser.add_argument('--tickers', nargs='*')
+    parser.add_argument('--start', help="Data inicial (p. ex. 2024-01-02)")
+    parser.add_argument('--end', help="Data final")
+    parser.add_argument('--samples', type=int, help="Mostra aleatòria de N jocs en lloc de la graella sencera")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--out', help="Desa la taula completa en CSV")
+    args = parser.parse_args()
+
+    frames = load_frames(args.data, args.tickers, args.start, args.end)
+    space = GRIDS[args.strategy]
+    param_sets = sample(space, args.samples, args.seed) if args.samples else grid(space)
+
+    start = time.perf_counter()
+    table = sweep(frames, args.strategy, param_sets, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"⏱️ {len(param_sets)} jocs de paràmetres en {elapsed:.1f}s")
+    print(table.head(args.top).to_string())
+    if args.out:
+        table.to_csv(args.out, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import numpy as np
+
+# ---------------------------------------------------------
+# CARTERA COLUMNAR
+# ---------------------------------------------------------
+# Una posició per ticker en arrays paral·lels (preu d'entrada, capital,
+# últim preu, P&L) i una màscara `open` en lloc d'un dict per ticker. La
+# valoració (mark-to-market), el P&L net de comissions i la comprovació
+# d'objectiu/stop són una sola operació vectorial sobre totes les posicions;
+# només les entrades i sortides efectives passen per Python.
+#
+# A la base de dades es continua desant un dict per ticker (to_dict /
+# from_dict), el mateix format que llegeixen les interfícies.
+
+
+class Portfolio:
+    def __init__(self, tickers, leverage, commission, max_positions=None):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.leverage = leverage
+        self.commission = commission
+        self.max_positions = max_positions
+        n = len(self.tickers)
+        self.open = np.zeros(n, dtype=bool)
+        self.entry_price = np.zeros(n)
+        self.invested = np.zeros(n)
+        self.price = np.zeros(n)
+        self.pnl = np.zeros(n)
+        self.pnl_pct = np.zeros(n)
+
+    # --- Valoració ---
+    def net_pnl(self, price, entry_price=None, invested=None):
+        # (invested*LEV/entry)*price - invested*LEV - invested*LEV*COMMISSION, vectorial
+        entry_price = self.entry_price if entry_price is None else entry_price
+        invested = self.invested if invested is None else invested
+        lev_invested = invested * self.leverage
+        with np.errstate(divide='ignore', invalid='ignore'):
+            net = lev_invested / entry_price * price - lev_invested - lev_invested * self.commission
+            pct = np.where(invested > 0, net / invested, 0.0)
+        return np.where(invested > 0, net, 0.0), pct
+
+    def mark(self, prices):
+        # prices: alineat amb self.tickers, NaN si no hi ha cotització
+        prices = np.asarray(prices, dtype=float)
+        have = np.isfinite(prices) & (prices > 0)
+        # Sense cotització, una posició oberta es valora al preu d'entrada
+        self.price = np.where(have, prices, np.where(self.open, self.entry_price, self.price))
+        net, pct = self.net_pnl(self.price)
+        self.pnl = np.where(self.open, net, 0.0)
+        self.pnl_pct = np.where(self.open, pct, 0.0)
+
+    def value(self):
+        # Capital invertit + P&L de les posicions obertes
+        return float((self.invested + self.pnl)[self.open].sum())
+
+    def exits(self, target, stop):
+        # Índexs de les posicions que han tocat l'objectiu o l'stop
+        hit = self.open & ((self.pnl_pct >= target) | (self.pnl_pct <= -stop))
+        return np.flatnonzero(hit)
+
+    # --- Entrades / sortides ---
+    @property
+    def open_count(self):
+        return int(self.open.sum())
+
+    def can_open(self):
+        return self.max_positions is None or self.open_count < self.max_positions
+
+    def enter(self, i, price, size):
+        self.open[i] = True
+        self.entry_price[i] = price
+        self.invested[i] = size
+        self.price[i] = price
+        self.pnl[i] = self.pnl_pct[i] = 0.0
+
+    def exit(self, i, price):
+        self.open[i] = False
+        self.price[i] = price
+        self.pnl[i] = self.pnl_pct[i] = 0.0
+
+    def entries(self):
+        # {ticker: preu d'entrada} de les posicions obertes (ExitMonitor)
+        return {self.tickers[i]: float(self.entry_price[i]) for i in np.flatnonzero(self.open)}
+
+    # --- Persistència ---
+    def to_dict(self):
+        return {t: {'status': 'INVESTED' if self.open[i] else 'CASH',
+                    'entry_price': float(self.entry_price[i]), 'invested': float(self.invested[i]),
+                    'price': float(self.price[i]), 'pnl': float(self.pnl[i]), 'pnl_pct': float(self.pnl_pct[i])}
+                for i, t in enumerate(self.tickers)}
+
+    @classmethod
+    def from_dict(cls, portfolio, tickers, leverage, commission, max_positions=None):
+        # Tickers de l'univers + posicions obertes de tickers que ja no hi són
+        extra = [t for t, item in portfolio.items() if t not in tickers and item.get('status') == 'INVESTED']
+        p = cls(list(tickers) + extra, leverage, commission, max_positions)
+        for t, item in portfolio.items():
+            i = p.index.get(t)
+            if i is None: continue
+            p.open[i] = item.get('status') == 'INVESTED'
+            p.entry_price[i] = item.get('entry_price', 0.0)
+            p.invested[i] = item.get('invested', 0.0)
+            p.price[i] = item.get('price', 0.0)
+            p.pnl[i] = item.get('pnl', 0.0)
+            p.pnl_pct[i] = item.get('pnl_pct', 0.0)
+        return p
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_frames
+from engine import TradingEngine
+from market_cache import MAX_BARS
+from metrics import Metrics
+from notifier import TelegramNotifier
+from scheduler import VirtualClock
+from state_store import StateStore
+from strategies import STRATEGIES
+
+# ---------------------------------------------------------
+# REPRODUCCIÓ ACCELERADA (REPLAY)
+# ---------------------------------------------------------
+# Fa córrer el motor en viu (engine.py) sobre espelmes d'1m gravades (un
+# BarStore o una carpeta de CSV) amb un rellotge virtual: el cicle, la
+# vigilància de sortides, el desat a SQLite i les notificacions passen pel
+# mateix codi que en viu, però cada sleep() només avança el temps. Una
+# setmana de mercat corre en segons i sense xarxa.
+#
+# ReplaySource fa de BarCache: a l'hora virtual t serveix les espelmes
+# tancades (inici < minut de t) i l'espelma en formació només amb el seu
+# Open (H = L = C = Open, sense volum), perquè el motor no vegi el futur.
+# Les notificacions van a TelegramStub, un servidor HTTP local que respon
+# com l'API de Telegram i es queda els missatges.
+#
+#   python replay.py bars --start 2024-01-08 --end 2024-01-13 --out replay_out
+#   python replay.py bars --start 2024-01-08 --end 2024-01-13 --out nou --compare replay_out
+
+REPLAY_DIR = "replay_out"
+
+
+class ReplaySource:
+    def __init__(self, frames, clock, max_bars=MAX_BARS):
+        self.clock = clock
+        self.max_bars = max_bars
+        self.data, self.ts = {}, {}
+        for ticker, df in frames.items():
+            if df is None or df.empty:
+                continue
+            df = df.sort_index()
+            index = df.index if df.index.tz is not None else df.index.tz_localize('UTC')
+            self.data[ticker] = df
+            self.ts[ticker] = index.tz_convert('UTC').as_unit('ns').asi8
+        self.frames = {}        # última finestra servida (el motor la fa servir amb el mercat tancat)
+
+    @property
+    def tickers(self):
+        return list(self.data)
+
+    @property
+    def end(self):
+        return max(pd.Timestamp(int(ts[-1]), unit='ns', tz='UTC') for ts in self.ts.values())
+
+    def window(self, ticker):
+        now = self.clock.now()
+        ts = self.ts.get(ticker)
+        if ts is None:
+            return None
+        minute = now.floor('min').value
+        closed = int(np.searchsorted(ts, minute, side='left'))
+        df = self.data[ticker]
+        if closed < len(ts) and ts[closed] <= now.value:
+            # Espelma en formació: a l'inici del minut només se'n sap l'Open
+            block = df.iloc[max(0, closed + 1 - self.max_bars):closed + 1]
+            values = block.to_numpy(dtype=float, copy=True)
+            cols = block.columns
+            for col in ('High', 'Low', 'Close'):
+                values[-1, cols.get_loc(col)] = values[-1, cols.get_loc('Open')]
+            if 'Volume' in cols:
+                values[-1, cols.get_loc('Volume')] = 0.0
+            out = pd.DataFrame(values, index=block.index, columns=cols)
+        else:
+            out = df.iloc[max(0, closed - self.max_bars):closed]
+        if out.empty:
+            return None
+        self.frames[ticker] = out
+        return out
+
+    def refresh_iter(self, tickers):
+        frames = {}
+        for ticker in tickers:
+            df = self.window(ticker)
+            if df is not None:
+                frames[ticker] = df
+        yield frames
+
+    def refresh(self, tickers):
+        frames = {}
+        for shard in self.refresh_iter(tickers):
+            frames.update(shard)
+        return frames
+
+
+class TelegramStub:
+    # Servidor local amb la forma de l'API de Telegram (POST /bot<token>/sendMessage).
+    # script: respostes forçades per a les properes peticions, en ordre:
+    # (status, cos) o HANG (no respon fins a close(), per provar els timeouts)
+    HANG = 'hang'
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.messages = []
+        self.script = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.released = threading.Event()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                with stub.lock:
+                    stub.requests += 1
+                    forced = stub.script.pop(0) if stub.script else None
+                if forced == stub.HANG:
+                    stub.released.wait()
+                    return
+                if forced is not None:
+                    status, body = forced
+                    self._reply(status, body if isinstance(body, bytes) else json.dumps(body).encode())
+                    return
+                ok = self.path.endswith("/sendMessage") and 'text' in payload
+                if ok:
+                    with stub.lock:
+                        stub.messages.append(payload)
+                body = json.dumps({'ok': ok, 'result': {}} if ok else {'ok': False, 'error_code': 400}).encode()
+                self._reply(200 if ok else 400, body)
+
+            def _reply(self, status, body):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name="telegram-stub", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.released.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _reset(out_dir, strategies):
+    # Cada reproducció comença amb carteres noves
+    os.makedirs(out_dir, exist_ok=True)
+    for s in strategies:
+        for suffix in ("", "-wal", "-shm"):
+            path = os.path.join(out_dir, s.db_file + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def replay(frames, start=None, end=None, strategies=None, out_dir=REPLAY_DIR, telegram=True):
+    strategies = strategies or list(STRATEGIES.values())
+    clock = VirtualClock(start if start is not None else min(df.index[0] for df in frames.values() if len(df)))
+    source = ReplaySource(frames, clock)
+    until = pd.Timestamp(end) if end is not None else source.end + pd.Timedelta(minutes=1)
+    until = until.tz_localize('UTC') if until.tzinfo is None else until.tz_convert('UTC')
+    _reset(out_dir, strategies)
+
+    stub = TelegramStub() if telegram else None
+    notifiers = []
+
+    def notifier(s):
+        if stub is None:
+            return None
+        # Cua gran: en temps virtual un cicle dura mil·lisegons i no s'ha de perdre cap avís
+        n = TelegramNotifier("replay", "replay", prefix=s.label, api_url=stub.url, max_queue=100000, linger=0.05)
+        notifiers.append(n)
+        return n
+
+    # Cada sleep() d'un cicle és un minut virtual: la vigilància es fa un cop per espelma
+    engine = TradingEngine(strategies, tickers=source.tickers, bar_cache=source, metrics=Metrics(),
+                           clock=clock, data_dir=out_dir, notifier=notifier, monitor_interval=60,
+                           checkpoint_file=None, metrics_file=None)
+    first = clock.now()
+    wall = time.perf_counter()
+    engine.run(until=until)
+    wall = time.perf_counter() - wall
+
+    for n in notifiers:
+        n.close()
+    if stub is not None:
+        stub.close()
+    return {
+        'engine': engine,
+        'start': first,
+        'end': clock.now(),
+        'wall_seconds': wall,
+        'messages': len(stub.messages) if stub else 0,
+    }
+
+
+def trades(out_dir, strategy):
+    store = StateStore(os.path.join(out_dir, strategy.db_file))
+    saved = store.load(history_limit=-1) or {}
+    return pd.DataFrame(saved.get('history', []))
+
+
+def compare(a_dir, b_dir, strategies=None, tol=1e-9):
+    # Mateixos trades (temps, ticker, resultat i P&L) a les dues reproduccions
+    out = {}
+    for s in strategies or list(STRATEGIES.values()):
+        a, b = trades(a_dir, s), trades(b_dir, s)
+        same = (len(a) == len(b)
+                and (len(a) == 0 or ((a['Time'].values == b['Time'].values).all()
+                                     and (a['Ticker'].values == b['Ticker'].values).all()
+                                     and np.allclose(a['PL'].values, b['PL'].values, atol=tol))))
+        out[s.name] = (same, len(a), len(b))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprodueix espelmes gravades pel motor en viu amb temps virtual")
+    parser.add_argument('data', help="BarStore o carpeta amb un CSV d'espelmes 1m per ticker")
+    parser.add_argument('--tickers', nargs='*')
+    parser.add_argument('--start', help="Hora virtual inicial (UTC); per defecte la primera espelma")
+    parser.add_argument('--end', help="Hora virtual final (UTC); per defecte l'última espelma")
+    parser.add_argument('--out', default=REPLAY_DIR, help="Carpeta per a les bases de dades de la reproducció")
+    parser.add_argument('--compare', help="Carpeta d'una reproducció anterior per comparar-ne els trades")
+    parser.add_argument('--no-telegram', action='store_true', help="Sense servidor Telegram local")
+    args = parser.parse_args()
+
+    # Tot l'històric fins a --end: les espelmes anteriors a --start escalfen els indicadors
+    frames = load_frames(args.data, args.tickers, None, args.end)
+    if not frames:
+        raise SystemExit(f"No hi ha espelmes a {args.data}")
+    result = replay(frames, args.start, args.end, out_dir=args.out, telegram=not args.no_telegram)
+
+    span = (result['end'] - result['start']).total_seconds()
+    print(f"⏩ {result['start']} -> {result['end']} ({span / 3600:.1f} h virtuals) en {result['wall_seconds']:.2f}s "
+          f"(x{span / max(result['wall_seconds'], 1e-9):,.0f}), {result['messages']} enviaments a Telegram")
+    for runner in result['engine'].runners:
+        st = runner.state
+        print(f"  {runner.strategy.name}: saldo {st['balance']:.2f} $, compte {st['equity']:.2f} $, "
+              f"{st['wins']} W / {st['losses']} L, {runner.portfolio.open_count} obertes")
+
+    if args.compare:
+        for name, (same, n_a, n_b) in compare(args.out, args.compare).items():
+            print(f"  {'✅' if same else '❌'} {name}: {n_a} trades ara, {n_b} a {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
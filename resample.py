@@ -0,0 +1,110 @@
+from collections import deque
+from itertools import islice
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# ESPELMES DE TEMPORALITAT SUPERIOR (5m, 15m, 1h)
+# ---------------------------------------------------------
+# Es deriven de les espelmes d'1m que ja té la BarCache: cap descàrrega
+# extra. Cada minut tancat s'afegeix a l'espelma superior en curs
+# (max/min/últim/suma) en O(1); quan arriba un minut d'un altre interval,
+# l'espelma en curs passa a tancada. L'espelma d'1m en formació només
+# s'hi combina de manera provisional (com peek() als indicadors).
+#
+# frame() retorna només les espelmes tancades que el pipeline encara no ha
+# vist més la que està en formació: el mateix contracte que
+# IndicatorSet.process() espera de les espelmes d'1m.
+
+TIMEFRAMES = {'5m': '5min', '15m': '15min', '1h': '1h'}
+MAX_BARS = 500          # espelmes tancades per ticker i temporalitat
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class Resampler:
+    def __init__(self, rule, max_bars=MAX_BARS):
+        self.freq = pd.Timedelta(rule)
+        self.bars = deque(maxlen=max_bars)  # (inici, o, h, l, c, v) tancades
+        self.cur = None                     # [inici, o, h, l, c, v] en curs
+        self.last_ts = None                 # últim minut tancat consumit
+        self.pending = None                 # tancades no retornades encara (None: totes)
+
+    def __getstate__(self):
+        # Checkpoint: els indicadors ja porten l'estat, n'hi ha prou amb l'última tancada
+        state = dict(self.__dict__)
+        state['bars'] = deque(list(self.bars)[-1:], maxlen=self.bars.maxlen)
+        return state
+
+    def _add(self, bucket, o, h, l, c, v):
+        cur = self.cur
+        if cur is not None and cur[0] == bucket:
+            cur[2] = max(cur[2], h)
+            cur[3] = min(cur[3], l)
+            cur[4] = c
+            cur[5] += v
+            return
+        if cur is not None:
+            self.bars.append(tuple(cur))
+            if self.pending is not None:
+                self.pending += 1
+        self.cur = [bucket, o, h, l, c, v]
+
+    def update(self, df):
+        # df: espelmes d'1m (l'última en formació) -> espelmes superiors
+        if df is None or len(df) < 2:
+            return None
+        closed = df.iloc[:-1]
+        if self.last_ts is not None:
+            closed = closed[closed.index > self.last_ts]
+        if len(closed):
+            buckets = closed.index.floor(self.freq)
+            values = [closed[c].to_numpy(dtype=float) for c in OHLCV]
+            for row in zip(buckets, *values):
+                self._add(*row)
+            self.last_ts = closed.index[-1]
+        return self.frame(df.index[-1], df.iloc[-1])
+
+    def frame(self, ts, last):
+        bucket = ts.floor(self.freq)
+        o, h, l, c, v = (float(last[col]) for col in OHLCV)
+        cur = self.cur
+        # Tancades noves + una més (fa de `prev`); IndicatorSet descarta les ja vistes
+        n = len(self.bars) if self.pending is None else self.pending + 1
+        rows = list(islice(self.bars, max(0, len(self.bars) - n), None))
+        if cur is not None and cur[0] == bucket:
+            forming = (bucket, cur[1], max(cur[2], h), min(cur[3], l), c, cur[5] + v)
+        else:
+            # El minut en formació obre una espelma nova: la d'abans ja és tancada
+            if cur is not None:
+                rows.append(tuple(cur))
+            forming = (bucket, o, h, l, c, v)
+        self.pending = 0
+        rows.append(forming)
+        return pd.DataFrame(rows, columns=['Datetime'] + OHLCV).set_index('Datetime')
+
+
+class MultiTimeframe:
+    # Un Resampler per ticker i temporalitat
+    def __init__(self, timeframes, max_bars=MAX_BARS):
+        self.timeframes = [tf for tf in timeframes if tf in TIMEFRAMES]
+        self.max_bars = max_bars
+        self.resamplers = {}
+
+    def update(self, ticker, df):
+        out = {}
+        for tf in self.timeframes:
+            key = (ticker, tf)
+            if key not in self.resamplers:
+                self.resamplers[key] = Resampler(TIMEFRAMES[tf], self.max_bars)
+            frame = self.resamplers[key].update(df)
+            if frame is not None:
+                out[tf] = frame
+        return out
+
+
+def resample(df, timeframe):
+    # Versió vectorial (backtest i comprovacions): mateixes espelmes que Resampler
+    rule = TIMEFRAMES[timeframe]
+    out = df[OHLCV].resample(rule, label='left', closed='left').agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    return out.dropna(subset=['Close'])
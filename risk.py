@@ -0,0 +1,188 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import DEFAULT_PARAMS, load_frames, run_backtest
+from state_store import StateStore
+from strategies import STRATEGIES
+
+# ---------------------------------------------------------
+# SIMULADOR DE RISC MONTE CARLO
+# ---------------------------------------------------------
+# A partir dels trades reals (ledger d'un bot, una reproducció) o d'un
+# backtest, genera centenars de milers de seqüències de trades remostrejant
+# els resultats (bootstrap, o per blocs per conservar les ratxes) i en treu
+# la distribució del drawdown màxim, el temps sota el màxim (trades fins a
+# recuperar-lo) i la probabilitat de ruïna per a cada combinació
+# d'ALLOCATION_PCT i palanquejament.
+#
+# Cada trade es guarda com a moviment del preu (pnl_pct / LEV + COMMISSION):
+# amb un altre palanquejament el mateix moviment dona
+# LEV' * (moviment - COMMISSION). Suposa les mateixes entrades i sortides
+# (amb més palanquejament l'objectiu i l'stop es tocarien abans) i trades
+# en sèrie: cadascun arrisca ALLOCATION_PCT del compte del moment.
+#
+# Vectorial: una matriu trades x camins (float32) per tros, totes les
+# combinacions sobre els mateixos sorteigs, i els trossos repartits en un
+# ProcessPool. Amb els camins a les columnes, cumsum i maximum.accumulate
+# avancen una fila contigua de camins a cada trade.
+
+PATHS = 200_000
+ALLOCATIONS = (0.05, 0.10, 0.20)
+LEVERAGES = (1, 3, 5)
+RUIN = 0.5              # ruïna: el compte cau per sota d'aquesta fracció del capital inicial
+CHUNK_CELLS = 2_000_000 # trades x camins per tros (~8 MB per matriu)
+QUANTILES = (50, 90, 95, 99)
+
+# ---------------------------------------------------------
+# 1. RESULTATS DELS TRADES
+# ---------------------------------------------------------
+def ledger_trades(path):
+    # Tots els trades desats d'un StateStore: DataFrame amb Time, PL_pct...
+    saved = StateStore(path).load(history_limit=-1) or {}
+    trades = pd.DataFrame(saved.get('history', []))
+    return trades.dropna(subset=['PL_pct']) if not trades.empty else trades
+
+def backtest_trades(data, strategy, tickers=None, start=None, end=None):
+    trades = run_backtest(load_frames(data, tickers, start, end), strategy)['trades']
+    if not trades.empty:
+        trades = trades.assign(Time=trades['Exit'].map(pd.Timestamp.timestamp))
+    return trades
+
+def price_moves(pnl_pct, leverage, commission):
+    # pnl_pct = LEV * (p / entry - 1) - LEV * COMMISSION  ->  p / entry - 1
+    return np.asarray(pnl_pct, dtype=float) / leverage + commission
+
+def trades_per_day(trades):
+    if trades.empty or 'Time' not in trades or len(trades) < 2:
+        return None
+    days = (trades['Time'].max() - trades['Time'].min()) / 86400
+    return len(trades) / days if days > 0 else None
+
+# ---------------------------------------------------------
+# 2. CAMINS
+# ---------------------------------------------------------
+def draw(rng, n, paths, horizon, block=1):
+    # Índexs (trades x camins) dels trades remostrejats; block > 1: blocs circulars consecutius
+    if block <= 1:
+        return rng.integers(0, n, size=(horizon, paths))
+    starts = rng.integers(0, n, size=(-(-horizon // block), 1, paths))
+    idx = (starts + np.arange(block)[:, None]) % n
+    return idx.reshape(-1, paths)[:horizon]
+
+def path_stats(returns, allocation, ruin=RUIN):
+    # returns: trades x camins (pnl_pct de cada trade). Compte relatiu en logaritmes:
+    # un trade que s'emporta tota la mida o més deixa el compte a zero
+    zero = returns.dtype.type(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_equity = np.cumsum(np.log1p(np.maximum(returns * returns.dtype.type(allocation), zero - 1)), axis=0)
+    peak = np.maximum.accumulate(np.maximum(log_equity, zero), axis=0)    # el capital inicial també és un màxim
+    drawdown = -np.expm1(log_equity - peak)
+    # Trades des de l'últim màxim: el tram més llarg és el temps de recuperació
+    steps = np.arange(1, returns.shape[0] + 1, dtype=np.int32)[:, None]
+    last_peak = np.maximum.accumulate(np.where(log_equity >= peak, steps, np.int32(0)), axis=0)
+    return {
+        'max_drawdown': np.nan_to_num(drawdown.max(axis=0), nan=1.0),
+        'underwater': (steps - last_peak).max(axis=0),
+        'ruined': log_equity.min(axis=0) <= np.log(ruin),
+        'final': np.expm1(log_equity[-1]),
+    }
+
+def _simulate_chunk(task):
+    moves, settings, commission, paths, horizon, block, ruin, seed = task
+    rng = np.random.default_rng(seed)
+    sampled = moves.astype(np.float32)[draw(rng, len(moves), paths, horizon, block)]
+    # Mateixos sorteigs per a totes les combinacions: les diferències són de la configuració
+    return [path_stats(np.float32(leverage) * (sampled - np.float32(commission)), allocation, ruin)
+            for allocation, leverage in settings]
+
+def simulate(moves, settings, commission, paths=PATHS, horizon=None, block=1, ruin=RUIN, seed=0, workers=None):
+    # {(allocation, leverage): {'max_drawdown': [...], 'underwater': [...], 'ruined': [...], ...}} per camí
+    moves = np.asarray(moves, dtype=float)
+    horizon = horizon or len(moves)
+    size = max(1, min(paths, CHUNK_CELLS // horizon))
+    counts = [min(size, paths - i) for i in range(0, paths, size)]
+    # Llavors independents del nombre de workers: el resultat és reproduïble
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    tasks = [(moves, settings, commission, n, horizon, block, ruin, s) for n, s in zip(counts, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        parts = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            parts = list(pool.map(_simulate_chunk, tasks))
+    return {setting: {key: np.concatenate([part[k][key] for part in parts]) for key in parts[0][k]}
+            for k, setting in enumerate(settings)}
+
+def report(results, per_day=None, quantiles=QUANTILES):
+    rows = []
+    for (allocation, leverage), r in results.items():
+        row = {'allocation': allocation, 'leverage': leverage, 'ruin_prob': float(r['ruined'].mean())}
+        for q in quantiles:
+            row[f'dd_p{q}'] = float(np.percentile(r['max_drawdown'], q))
+        for q in quantiles:
+            row[f'recovery_p{q}'] = float(np.percentile(r['underwater'], q))
+        if per_day:
+            row['recovery_days_p90'] = row['recovery_p90'] / per_day
+        row['final_p5'], row['final_p50'], row['final_p95'] = (float(v) for v in
+                                                                np.percentile(r['final'], (5, 50, 95)))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+# ---------------------------------------------------------
+# 3. LÍNIA D'ORDRES
+# ---------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Drawdowns, recuperació i ruïna per Monte Carlo sobre els trades")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='balanced',
+                        help="Ledger de l'estratègia (la seva base de dades) i el seu palanquejament")
+    parser.add_argument('--db', help="Una altra base de dades (p. ex. d'una reproducció)")
+    parser.add_argument('--backtest', metavar='DATA', help="Trades d'un backtest sobre aquestes espelmes")
+    parser.add_argument('--tickers', nargs='*')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--paths', type=int, default=PATHS)
+    parser.add_argument('--horizon', type=int, help="Trades per camí (per defecte, tants com l'historial)")
+    parser.add_argument('--block', type=int, default=1, help="Mida dels blocs (1 = bootstrap simple)")
+    parser.add_argument('--allocations', nargs='*', type=float, default=list(ALLOCATIONS))
+    parser.add_argument('--leverages', nargs='*', type=float, default=list(LEVERAGES))
+    parser.add_argument('--ruin', type=float, default=RUIN)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--out', help="Desa la taula en CSV")
+    args = parser.parse_args()
+
+    strategy = STRATEGIES[args.strategy]
+    if args.backtest:
+        trades = backtest_trades(args.backtest, args.strategy, args.tickers, args.start, args.end)
+        leverage, commission = DEFAULT_PARAMS['LEVERAGE'], DEFAULT_PARAMS['COMMISSION_RATE']
+    else:
+        trades = ledger_trades(args.db or strategy.db_file)
+        leverage, commission = strategy.leverage, strategy.commission
+    if len(trades) < 10:
+        raise SystemExit(f"Només hi ha {len(trades)} trades: massa pocs per remostrejar")
+
+    moves = price_moves(trades['PL_pct'].values, leverage, commission)
+    settings = [(a, lev) for a in args.allocations for lev in args.leverages]
+    start = time.perf_counter()
+    results = simulate(moves, settings, commission, args.paths, args.horizon, args.block, args.ruin,
+                       args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+
+    horizon = args.horizon or len(moves)
+    table = report(results, trades_per_day(trades))
+    print(f"🎲 {args.paths:,} camins x {horizon} trades x {len(settings)} configuracions en {elapsed:.1f}s "
+          f"({len(trades)} trades d'origen, win rate {(trades['PL_pct'] > 0).mean():.1%})")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    if args.out:
+        table.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
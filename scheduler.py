@@ -0,0 +1,183 @@
+import time
+from datetime import time as dtime
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# CALENDARI: TANCAMENT D'ESPELMA I HORARI DE MERCAT
+# ---------------------------------------------------------
+# El cicle es desperta just després que tanqui cada espelma d'1m (més un
+# petit marge perquè el proveïdor la publiqui), no 60 s després d'acabar la
+# feina: el temps de descàrrega no fa derivar el cicle.
+#
+# Cada símbol té la seva sessió segons el sufix de Yahoo:
+#   BTC-USD       cripto, 24/7
+#   EURUSD=X      divises, de diumenge 17:00 a divendres 17:00 (Nova York)
+#   CL=F          futurs, igual però amb la pausa diària 17:00-18:00
+#   SAP.DE, 7203.T...  accions d'altres borses, amb l'horari local de la
+#                 borsa (EXCHANGES) i la pausa de migdia si en té
+#   la resta      accions/ETF dels EUA, dilluns-divendres 9:30-16:00
+# Un sufix desconegut s'avisa un cop i es tracta com a sempre obert: es
+# baixa a cada cicle i només s'hi entra amb una espelma que acabi de tancar.
+# Sense calendari de festius: un festiu només costa peticions que tornen buides.
+# Les entrades s'avaluen sobre espelmes tancades (a l'hora del cicle
+# l'espelma en formació només té un parell de segons de dades).
+#
+# El motor demana l'hora a un rellotge: SystemClock en viu, VirtualClock per
+# reproduir dades gravades (replay.py), on sleep() només avança el temps.
+
+BAR_SECONDS = 60
+CLOSE_DELAY = 2.0       # segons després del tancament abans de demanar l'espelma
+EXCHANGE_TZ = "America/New_York"
+
+EQUITY_OPEN, EQUITY_CLOSE = dtime(9, 30), dtime(16, 0)
+ROLLOVER = dtime(17, 0)
+
+# Sufix de Yahoo -> (zona horària, obertura, tancament, pausa de migdia o None)
+US_SESSION = (EXCHANGE_TZ, EQUITY_OPEN, EQUITY_CLOSE, None)
+EXCHANGES = {
+    'L': ("Europe/London", dtime(8, 0), dtime(16, 30), None),
+    'DE': ("Europe/Berlin", dtime(9, 0), dtime(17, 30), None),
+    'F': ("Europe/Berlin", dtime(8, 0), dtime(22, 0), None),
+    'PA': ("Europe/Paris", dtime(9, 0), dtime(17, 30), None),
+    'AS': ("Europe/Amsterdam", dtime(9, 0), dtime(17, 30), None),
+    'BR': ("Europe/Brussels", dtime(9, 0), dtime(17, 30), None),
+    'LS': ("Europe/Lisbon", dtime(8, 0), dtime(16, 30), None),
+    'MC': ("Europe/Madrid", dtime(9, 0), dtime(17, 30), None),
+    'MI': ("Europe/Rome", dtime(9, 0), dtime(17, 30), None),
+    'SW': ("Europe/Zurich", dtime(9, 0), dtime(17, 30), None),
+    'ST': ("Europe/Stockholm", dtime(9, 0), dtime(17, 30), None),
+    'CO': ("Europe/Copenhagen", dtime(9, 0), dtime(17, 0), None),
+    'OL': ("Europe/Oslo", dtime(9, 0), dtime(16, 20), None),
+    'HE': ("Europe/Helsinki", dtime(10, 0), dtime(18, 30), None),
+    'T': ("Asia/Tokyo", dtime(9, 0), dtime(15, 30), (dtime(11, 30), dtime(12, 30))),
+    'HK': ("Asia/Hong_Kong", dtime(9, 30), dtime(16, 0), (dtime(12, 0), dtime(13, 0))),
+    'SS': ("Asia/Shanghai", dtime(9, 30), dtime(15, 0), (dtime(11, 30), dtime(13, 0))),
+    'SZ': ("Asia/Shanghai", dtime(9, 30), dtime(15, 0), (dtime(11, 30), dtime(13, 0))),
+    'KS': ("Asia/Seoul", dtime(9, 0), dtime(15, 30), None),
+    'TW': ("Asia/Taipei", dtime(9, 0), dtime(13, 30), None),
+    'SI': ("Asia/Singapore", dtime(9, 0), dtime(17, 0), (dtime(12, 0), dtime(13, 0))),
+    'NS': ("Asia/Kolkata", dtime(9, 15), dtime(15, 30), None),
+    'BO': ("Asia/Kolkata", dtime(9, 15), dtime(15, 30), None),
+    'AX': ("Australia/Sydney", dtime(10, 0), dtime(16, 0), None),
+    'NZ': ("Pacific/Auckland", dtime(10, 0), dtime(16, 45), None),
+    'TO': ("America/Toronto", dtime(9, 30), dtime(16, 0), None),
+    'V': ("America/Toronto", dtime(9, 30), dtime(16, 0), None),
+    'SA': ("America/Sao_Paulo", dtime(10, 0), dtime(17, 0), None),
+    'MX': ("America/Mexico_City", dtime(8, 30), dtime(15, 0), None),
+}
+_warned = set()     # sufixos desconeguts ja avisats
+
+
+def asset_class(ticker):
+    if ticker.endswith('-USD') or ticker.endswith('-EUR') or ticker.endswith('-USDT'):
+        return 'crypto'
+    if ticker.endswith('=X'):
+        return 'forex'
+    if ticker.endswith('=F'):
+        return 'futures'
+    if '.' in ticker and ticker.rsplit('.', 1)[1] not in EXCHANGES:
+        return 'unknown'
+    return 'equity'
+
+
+def session(ticker):
+    # Horari de la borsa d'una acció; sense sufix, els EUA
+    suffix = ticker.rsplit('.', 1)[1] if '.' in ticker else None
+    return EXCHANGES.get(suffix, US_SESSION)
+
+
+def is_open(ticker, now=None):
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    kind = asset_class(ticker)
+    if kind == 'crypto':
+        return True
+    if kind == 'unknown':
+        suffix = ticker.rsplit('.', 1)[1]
+        if suffix not in _warned:
+            _warned.add(suffix)
+            print(f"⚠️ Sufix .{suffix} sense horari conegut ({ticker}): es tracta com a sempre obert")
+        return True
+    if kind == 'equity':
+        tz, start, end, lunch = session(ticker)
+        local = now.tz_convert(tz)
+        day, t = local.weekday(), local.time()      # dilluns = 0
+        if lunch is not None and lunch[0] <= t < lunch[1]:
+            return False
+        return day < 5 and start <= t < end
+    local = now.tz_convert(EXCHANGE_TZ)
+    day, t = local.weekday(), local.time()
+    # Divises i futurs: de diumenge 17:00 a divendres 17:00
+    if day == 5 or (day == 6 and t < ROLLOVER) or (day == 4 and t >= ROLLOVER):
+        return False
+    if kind == 'futures' and ROLLOVER <= t < dtime(18, 0):
+        return False
+    return True
+
+
+def open_tickers(tickers, now=None):
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    return [t for t in tickers if is_open(t, now)]
+
+
+def active_tickers(tickers, now=None, bar_seconds=BAR_SECONDS):
+    # Oberts ara o durant l'última espelma tancada: just després del tancament
+    # de la sessió es fa una baixada més per tenir l'última espelma completa
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    last_bar = now.floor(f'{bar_seconds}s') - pd.Timedelta(seconds=bar_seconds)
+    return [t for t in tickers if is_open(t, now) or is_open(t, last_bar)]
+
+
+def seconds_to_next_bar(now=None, bar_seconds=BAR_SECONDS, delay=CLOSE_DELAY):
+    # Del moment actual fins a `delay` segons després del pròxim tancament
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    epoch = now.timestamp()
+    wait = bar_seconds - (epoch % bar_seconds) + delay
+    if wait > bar_seconds:
+        wait -= bar_seconds
+    return wait
+
+
+def closed_bars(df, now, bar_seconds=BAR_SECONDS):
+    # (espelmes tancades, fresca): treu l'espelma en formació; fresca si
+    # l'última tancada és la del minut que acaba de tancar
+    bar = pd.Timedelta(seconds=bar_seconds)
+    if len(df) and df.index.tz is None:
+        now = now.tz_convert('UTC').tz_localize(None)
+    if len(df) and df.index[-1] + bar > now:
+        df = df.iloc[:-1]
+    fresh = bool(len(df)) and df.index[-1] >= now.floor(f'{bar_seconds}s') - bar
+    return df, fresh
+
+
+# ---------------------------------------------------------
+# RELLOTGES
+# ---------------------------------------------------------
+class SystemClock:
+    def now(self):
+        return pd.Timestamp.now(tz='UTC')
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    # Temps simulat: cap espera real, el bucle va tan de pressa com la CPU
+    def __init__(self, start):
+        start = pd.Timestamp(start)
+        self.current = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+
+    def now(self):
+        return self.current
+
+    def monotonic(self):
+        return self.current.value / 1e9
+
+    def sleep(self, seconds):
+        self.current += pd.Timedelta(seconds=max(0.0, seconds))
+
+
+SYSTEM_CLOCK = SystemClock()
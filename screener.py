@@ -0,0 +1,75 @@
+import numpy as np
+
+# ---------------------------------------------------------
+# CRIBRATGE VECTORIAL (TOTS ELS TICKERS ALHORA)
+# ---------------------------------------------------------
+# Les dues últimes espelmes de cada ticker (prev i curr) amb tots els
+# indicadors del pipeline es guarden en dues matrius tickers x camps. Les
+# regles d'entrada de strategies.py s'avaluen un sol cop sobre tot el panell
+# (màscares booleanes) en lloc de fer iloc[-1] / iloc[-2] ticker a ticker;
+# els candidats surten ordenats per la força del senyal de cada estratègia.
+# Un ticker sense dades té tota la fila a NaN i cap condició el selecciona.
+
+
+class Row:
+    # row['EMA_50'] -> array amb el valor de tots els tickers
+    def __init__(self, values, fields):
+        self.values = values
+        self.fields = fields
+
+    def __getitem__(self, name):
+        return self.values[:, self.fields[name]]
+
+
+class Panel:
+    def __init__(self, tickers, fields):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.names = ['Close'] + [f for f in fields if f != 'Close']
+        self.fields = {name: j for j, name in enumerate(self.names)}
+        shape = (len(self.tickers), len(self.names))
+        self.prev_values = np.full(shape, np.nan)
+        self.curr_values = np.full(shape, np.nan)
+        self.tradable = np.zeros(len(self.tickers), dtype=bool)    # dades fresques (mercat obert)
+        self.time = [None] * len(self.tickers)                      # espelma de curr
+        self.positions = {}     # columnes del df -> posició de cada camp (totes les files tenen les mateixes)
+        self.curr = Row(self.curr_values, self.fields)
+        self.prev = Row(self.prev_values, self.fields)
+
+    def set(self, ticker, df, tradable=True):
+        # df: les 2 últimes espelmes amb indicadors (sortida del pipeline)
+        i = self.index.get(ticker)
+        if i is None or df is None or len(df) < 2:
+            return
+        self.tradable[i] = tradable
+        self.time[i] = df.index[-1]
+        key = tuple(df.columns)
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = df.columns.get_indexer(self.names)
+        values = np.where(pos >= 0, df.to_numpy(dtype=float)[-2:, pos], np.nan)
+        self.prev_values[i], self.curr_values[i] = values[0], values[1]
+
+    @property
+    def close(self):
+        return self.curr_values[:, 0]
+
+    def ready(self, columns):
+        # Tots els indicadors de l'estratègia escalfats a prev i curr
+        cols = [self.fields[c] for c in columns]
+        return ~(np.isnan(self.prev_values[:, cols]).any(axis=1) | np.isnan(self.curr_values[:, cols]).any(axis=1))
+
+    def candidates(self, strategy, eligible=None):
+        # Índexs dels tickers amb senyal d'entrada, de més a menys força
+        price = self.close
+        with np.errstate(invalid='ignore'):
+            mask = self.ready(strategy.columns) & np.asarray(strategy.entry(self.curr, self.prev, price), dtype=bool)
+        if eligible is not None:
+            mask &= eligible
+        idx = np.flatnonzero(mask)
+        if strategy.strength is None or len(idx) < 2:
+            return idx
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = np.asarray(strategy.strength(self.curr, self.prev, price), dtype=float)[idx]
+        # Ordre estable: a igual força, l'ordre de l'univers
+        return idx[np.argsort(-np.nan_to_num(score, nan=-np.inf), kind='stable')]
@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import threading
+
+from ledger import COLUMNS, TradeLedger, parse_legacy
+
+# ---------------------------------------------------------
+# ESTAT PERSISTENT (SQLITE EN MODE WAL)
+# ---------------------------------------------------------
+# Substitueix el JSON que es reescrivia sencer a cada canvi:
+#   - kv:        balance, equity, wins, losses, last_update i les
+#                estadístiques del llibre de trades (un valor per fila)
+#   - portfolio: una fila per ticker
+#   - trades:    un INSERT per trade amb camps numèrics (només s'hi afegeix)
+# Cada save() és una sola transacció; amb WAL els lectors veuen sempre
+# l'últim estat confirmat sense bloquejar l'escriptor. version() és un
+# comptador que cada save() incrementa, comparable entre connexions (la
+# cache de dashboard.py el comparteix entre visitants i només rellegeix si
+# ha canviat).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS portfolio (ticker TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY AUTOINCREMENT, time REAL NOT NULL,
+                                   ticker TEXT NOT NULL, res TEXT NOT NULL, pl REAL NOT NULL, pl_pct REAL);
+"""
+SCALARS = ('balance', 'equity', 'wins', 'losses', 'last_update', 'stats')
+
+
+def rebuild_stats(trades):
+    # Només per migracions: recorre l'historial un sol cop
+    ledger = TradeLedger()
+    for t in trades:
+        ledger.add(t['Ticker'], t['PL'], t['PL_pct'], t['Res'] == 'WIN', ts=t['Time'])
+    return ledger.stats()
+
+
+class StateStore:
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+        # empty() només estalvia llegir el JSON: la comprovació que compta és dins la transacció
+        if legacy_json and os.path.exists(legacy_json) and self.empty():
+            self._import_json(legacy_json)
+
+    def _conn(self):
+        # Una connexió per fil: sqlite3 no comparteix connexions entre fils
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def empty(self):
+        return self._conn().execute("SELECT COUNT(*) FROM kv").fetchone()[0] == 0
+
+    def _import_json(self, file):
+        # Migració única des del fitxer antic. Els scripts de Streamlit i el
+        # motor obren la base de dades alhora: només importa qui la troba buida
+        # dins la transacció d'escriptura, i els altres no dupliquen l'historial
+        try:
+            with open(file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error important {file}: {e}")
+            return
+        trades = [parse_legacy(entry) for entry in data.get('history', [])]
+        data['stats'] = rebuild_stats(trades)
+        self.save(data, trades, only_if_empty=True)
+
+    def _trade_rows(self, trades):
+        return [(t['Time'], t['Ticker'], t['Res'], t['PL'], t['PL_pct']) for t in trades]
+
+    def _insert_trades(self, conn, rows):
+        conn.executemany("INSERT INTO trades (time, ticker, res, pl, pl_pct) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def save(self, state, trades=(), only_if_empty=False):
+        # state: dict amb SCALARS + 'portfolio'; trades: trades nous a afegir.
+        # Tot es serialitza abans d'obrir la transacció: dins només hi ha SQL.
+        # only_if_empty: no escriu res si la base de dades ja té estat
+        kv = [(k, json.dumps(state[k])) for k in SCALARS if k in state]
+        portfolio = [(t, json.dumps(item)) for t, item in state.get('portfolio', {}).items()]
+        rows = self._trade_rows(trades)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if only_if_empty and conn.execute("SELECT 1 FROM kv LIMIT 1").fetchone():
+                conn.execute("COMMIT")
+                return False
+            conn.executemany("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", kv)
+            conn.executemany("INSERT OR REPLACE INTO portfolio (ticker, data) VALUES (?, ?)", portfolio)
+            self._insert_trades(conn, rows)
+            conn.execute("INSERT INTO kv (key, value) VALUES ('version', '1') "
+                         "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def load(self, history_limit=50):
+        # Totes les lectures dins la mateixa transacció: instantània coherent
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            kv = {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM kv")}
+            portfolio = {t: json.loads(d) for t, d in conn.execute("SELECT ticker, data FROM portfolio")}
+            rows = conn.execute("SELECT time, ticker, res, pl, pl_pct FROM trades ORDER BY id DESC LIMIT ?",
+                                (history_limit,)).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        if not kv:
+            return None
+        kv['portfolio'] = portfolio
+        kv['history'] = [dict(zip(COLUMNS, row)) for row in reversed(rows)]
+        return kv
+
+    def version(self):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else None
@@ -0,0 +1,174 @@
+from indicators import EMA, RSI, ADX, MACD
+from market_cache import load_universe
+from resample import TIMEFRAMES
+
+# ---------------------------------------------------------
+# ESTRATÈGIES (PLUGINS)
+# ---------------------------------------------------------
+# Cada estratègia declara els indicadors que necessita com a especificacions
+# ('EMA', 50), ('MACD', 12, 26, 9)... El pipeline compartit calcula cada
+# especificació diferent un sol cop per espelma i ticker; dues estratègies
+# que demanen ('EMA', 50) llegeixen la mateixa columna. Afegir-ne una de
+# nova només afegeix els indicadors que encara no hi eren.
+#
+# Les regles d'entrada fan servir & (no `and`): s'avaluen sobre el panell
+# sencer del screener, una columna per camp i una fila per ticker.
+#
+# Temporalitat superior: ('15m', ('EMA', 50)) calcula l'EMA 50 sobre
+# espelmes de 15m derivades de les d'1m (resample.py) i surt com a columna
+# EMA_50_15m. A prev/curr hi ha l'última espelma de 15m tancada i la que es
+# forma, no el valor minut a minut.
+
+# TICKERS_FILE (un símbol per línia) substitueix aquesta llista per un univers més gran
+TICKERS = load_universe(['NVDA', 'TSLA', 'AMZN', 'META', 'LLY', 'JPM', 'USO', 'GLD', 'BTC-USD', 'COST'])
+TIMEFRAME = "1m"
+
+INDICATORS = {
+    'EMA': (EMA, ('EMA_{}',)),
+    'RSI': (RSI, ('RSI_{}',)),
+    'ADX': (ADX, ('ADX_{}',)),
+    'MACD': (MACD, ('MACD_{}_{}_{}', 'MACD_SIG_{}_{}_{}')),
+}
+
+def split(spec):
+    # ('15m', ('EMA', 50)) -> ('15m', ('EMA', 50)); ('EMA', 50) -> ('1m', ('EMA', 50))
+    if spec[0] in TIMEFRAMES:
+        return spec
+    return TIMEFRAME, spec
+
+def columns(spec):
+    # ('EMA', 50) -> ('EMA_50',); ('MACD', 12, 26, 9) -> ('MACD_12_26_9', 'MACD_SIG_12_26_9')
+    timeframe, (kind, *args) = split(spec)
+    _, names = INDICATORS[kind]
+    suffix = "" if timeframe == TIMEFRAME else f"_{timeframe}"
+    return tuple(name.format(*args) + suffix for name in names)
+
+def build(spec):
+    _, (kind, *args) = split(spec)
+    cls, _ = INDICATORS[kind]
+    return cls(*args)
+
+
+class Strategy:
+    def __init__(self, name, label, indicators, entry, messages, db_file, legacy_json, strength=None,
+                 leverage=5, allocation_pct=0.10, max_positions=10, target=0.0085, stop=0.0085,
+                 commission=0.001, initial_capital=10000.0):
+        self.name = name
+        self.label = label                  # prefix dels missatges de Telegram
+        self.indicators = indicators        # llista d'especificacions
+        self.entry = entry                  # entry(curr, prev, price) -> màscara
+        self.strength = strength            # strength(curr, prev, price) -> ordre dels candidats
+        self.messages = messages            # plantilles 'entry', 'win', 'loss'
+        self.db_file = db_file
+        self.legacy_json = legacy_json
+        self.leverage = leverage
+        self.allocation_pct = allocation_pct
+        self.max_positions = max_positions  # None: sense límit
+        self.target = target
+        self.stop = stop
+        self.commission = commission
+        self.initial_capital = initial_capital
+
+    @property
+    def columns(self):
+        return [c for spec in self.indicators for c in columns(spec)]
+
+
+def pipeline_specs(strategies):
+    # Unió sense duplicats de les especificacions -> una factory per
+    # IndicatorEngine i temporalitat
+    unique = list(dict.fromkeys(spec for s in strategies for spec in s.indicators))
+    by_timeframe = {}
+    for spec in unique:
+        by_timeframe.setdefault(split(spec)[0], []).append(spec)
+
+    def factory(specs):
+        def make():
+            out = {}
+            for spec in specs:
+                names = columns(spec)
+                out[names if len(names) > 1 else names[0]] = build(spec)
+            return out
+        return make
+    return unique, {tf: factory(specs) for tf, specs in by_timeframe.items()}
+
+# ---------------------------------------------------------
+# BALANCED (bot_proves.py): EMA 50 + RSI + ADX
+# ---------------------------------------------------------
+def balanced_entry(curr, prev, price):
+    # 1. TENDÈNCIA: Preu per sobre de l'EMA 50
+    # Això indica que a curt/mig termini la tendència és alcista.
+    # Molt més fàcil de complir que l'EMA 200.
+    trend_ok = price > curr['EMA_50']
+
+    # 2. MOMENTUM: RSI creua 50 cap amunt
+    # Indiquem que la força compradora està guanyant terreny.
+    # Evitem comprar si ja està massa car (RSI > 70)
+    rsi_rising = (prev['RSI_14'] < 50) & (curr['RSI_14'] > 50)
+    not_overbought = curr['RSI_14'] < 70
+
+    # 3. ACTIVITAT: ADX > 20
+    # Ens assegurem que el mercat no estigui totalment pla.
+    adx_ok = curr['ADX_14'] > 20
+    return trend_ok & rsi_rising & not_overbought & adx_ok
+
+def balanced_strength(curr, prev, price):
+    # Primer els tickers amb la tendència més forta
+    return curr['ADX_14']
+
+BALANCED = Strategy(
+    name='balanced',
+    label="⚖️ [BOT 0.85%]",
+    indicators=[('EMA', 50), ('RSI', 14), ('ADX', 14)],
+    entry=balanced_entry,
+    strength=balanced_strength,
+    messages={
+        'entry': "⚖️ ENTRADA: {ticker}\nPreu > EMA50 + RSI Creuant 50\nInversió: {size:.2f}$",
+        'win': "✅ WIN: {ticker}\nBenefici: +{pnl:.2f}$ (+0.85%)",
+        'loss': "❌ LOSS: {ticker}\nPèrdua: {pnl:.2f}$",
+    },
+    db_file="bot_balanced_data.db",
+    legacy_json="bot_balanced_data.json",
+)
+
+# ---------------------------------------------------------
+# SNIPER (bot_test.py): EMA 200 + MACD
+# ---------------------------------------------------------
+def sniper_entry(curr, prev, price):
+    # 1. TENDÈNCIA MAJOR: Preu > EMA 200
+    # Garanteix que estem en territori alcista segur.
+    trend_ok = price > curr['EMA_200']
+
+    # 2. ZONA DE CORRECCIÓ: MACD < 0
+    # El MACD ha d'estar negatiu. Això vol dir que el preu ha "descansat"
+    # i no estem comprant al sostre.
+    pullback_ok = curr['MACD_12_26_9'] < 0
+
+    # 3. SENYAL DE GIR: Creuament MACD (Golden Cross)
+    # La línia MACD creua per sobre de la Senyal.
+    # Abans estava per sota (prev), ara està per sobre (curr).
+    # Aquest és el moment EXACTE del gir a l'alça.
+    crossover = ((prev['MACD_12_26_9'] < prev['MACD_SIG_12_26_9'])
+                 & (curr['MACD_12_26_9'] > curr['MACD_SIG_12_26_9']))
+    return trend_ok & pullback_ok & crossover
+
+def sniper_strength(curr, prev, price):
+    # Primer el gir més decidit (histograma MACD relatiu al preu)
+    return (curr['MACD_12_26_9'] - curr['MACD_SIG_12_26_9']) / price
+
+SNIPER = Strategy(
+    name='sniper',
+    label="🏆 [BOT SNIPER]",
+    indicators=[('EMA', 200), ('MACD', 12, 26, 9)],
+    entry=sniper_entry,
+    strength=sniper_strength,
+    messages={
+        'entry': "🏆 ENTRADA SNIPER: {ticker}\nPreu > EMA200\nMACD Creuament (Zona negativa)\nInv: {size:.2f}$",
+        'win': "✅ WIN: {ticker} (+{pnl:.2f}$)",
+        'loss': "❌ LOSS: {ticker} ({pnl:.2f}$)",
+    },
+    db_file="bot_gold_data.db",
+    legacy_json="bot_gold_data.json",
+)
+
+STRATEGIES = {s.name: s for s in (BALANCED, SNIPER)}
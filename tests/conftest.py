@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Els mòduls del bot són scripts a l'arrel del repositori
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import is_open  # noqa: E402
+
+
+def synthetic_bars(tickers, start, minutes, seed=0, vol=0.0015):
+    # Camí aleatori d'1m amb OHLCV coherent, només dins la sessió de cada ticker
+    rng = np.random.default_rng(seed)
+    # Índex en microsegons, com el que llegeix load_frames dels CSV amb pandas 3
+    index = pd.date_range(start, periods=minutes, freq="1min", tz="UTC").as_unit("us")
+    frames = {}
+    for ticker in tickers:
+        ix = index[[is_open(ticker, ts) for ts in index]]
+        n = len(ix)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, vol, n)))
+        # Obertura amb un petit salt respecte al tancament anterior
+        open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, vol / 4, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, n)))
+        frames[ticker] = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                                       'Volume': 1000.0}, index=ix)
+    return frames
+
+
+@pytest.fixture(scope="session")
+def bars():
+    # Tres mercats 24/7 (o gairebé) i una acció que tanca la sessió a mig dia
+    return synthetic_bars(['BTC-USD', 'ETH-USD', 'EURUSD=X', 'SPY'], "2024-01-08 12:00", 720)
@@ -0,0 +1,16 @@
+import pytest
+
+from backtest import check
+
+
+@pytest.mark.parametrize("strategy", ["balanced", "sniper"])
+@pytest.mark.parametrize("max_positions", [None, 2])
+def test_backtest_matches_live_engine(bars, strategy, max_positions):
+    # El motor en viu (TradingEngine via replay) i el backtest vectorial fan
+    # exactament els mateixos trades sobre les mateixes espelmes
+    params = {'MAX_POSITIONS': max_positions}
+    same, fast, live = check(bars, strategy, params)
+    assert len(live) > 10
+    assert len(fast['trades']) == len(live)
+    assert same
+
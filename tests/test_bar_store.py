@@ -0,0 +1,22 @@
+import numpy as np
+
+from bar_store import BarStore, COLUMNS, TS
+
+
+def test_append_repairs_a_torn_write(tmp_path, bars):
+    df = bars['BTC-USD']
+    store = BarStore(str(tmp_path))
+    assert store.append('BTC-USD', df.iloc[:20]) == 20
+
+    # Un procés mor a mig append: preus de més i una fila de temps a mitges
+    for col in COLUMNS:
+        with open(store._file('BTC-USD', col), 'ab') as f:
+            f.write(np.zeros(2).tobytes())
+    with open(store._file('BTC-USD', TS), 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert store.length('BTC-USD') == 20
+
+    assert store.append('BTC-USD', df.iloc[:30]) == 10
+    out = store.frame('BTC-USD')
+    assert out.index.equals(df.index[:30].as_unit('ns'))
+    np.testing.assert_array_equal(out[COLUMNS].values, df[COLUMNS].values[:30])
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from metrics import Metrics
+from notifier import MAX_TEXT, TelegramNotifier
+from replay import TelegramStub
+
+
+@pytest.fixture
+def stub():
+    stub = TelegramStub()
+    yield stub
+    stub.close()
+
+
+def notifier(stub, **kwargs):
+    options = dict(prefix="*BOT*", linger=0.2, backoff=0.01, timeout=(1, 1))
+    options.update(kwargs)
+    return TelegramNotifier("token", "chat", api_url=stub.url, **options)
+
+
+def texts(stub):
+    return [m['text'] for m in stub.messages]
+
+
+def test_messages_of_one_cycle_go_out_together(stub):
+    n = notifier(stub)
+    for msg in ("compra SPY", "venda BTC-USD", "resum"):
+        assert n.send(msg)
+    n.close()
+    assert texts(stub) == ["*BOT*\ncompra SPY\n\nvenda BTC-USD\n\nresum"]
+    assert n.sent == 1
+
+
+def test_long_messages_are_split_under_the_limit(stub):
+    n = notifier(stub)
+    lines = ["a" * 3000, "b" * 3000, "c" * 9000]
+    n.send("\n".join(lines))
+    n.close()
+    out = texts(stub)
+    assert len(out) > 1
+    assert all(len(t) <= MAX_TEXT and t.startswith("*BOT*\n") for t in out)
+    # Cap caràcter perdut: només s'hi afegeix la capçalera i salts de línia
+    body = "".join(t[len("*BOT*\n"):].replace("\n", "") for t in out)
+    assert body == "".join(lines)
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_errors_are_retried(stub, status):
+    stub.script = [(status, {'ok': False, 'parameters': {'retry_after': 0}})] * 2
+    n = notifier(stub)
+    n.send("compra SPY")
+    n.close()
+    assert texts(stub) == ["*BOT*\ncompra SPY"]
+    assert stub.requests == 3
+    assert (n.sent, n.failed) == (1, 0)
+
+
+def test_unreadable_retry_after_falls_back_to_backoff(stub):
+    stub.script = [(429, b"no json")]
+    metrics = Metrics()
+    n = notifier(stub, metrics=metrics)
+    n.send("compra SPY")
+    n.close()
+    assert texts(stub) == ["*BOT*\ncompra SPY"]
+    assert 'notifier_errors_total{kind="retry_after"} 1' in metrics.render()
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.script = [(400, {'ok': False, 'error_code': 400})]
+    n = notifier(stub, retries=3)
+    n.send("compra SPY")
+    n.close()
+    assert stub.requests == 1
+    assert (n.sent, n.failed) == (0, 1)
+
+
+def test_hung_endpoint_times_out_without_blocking_send(stub):
+    stub.script = [TelegramStub.HANG]
+    metrics = Metrics()
+    n = notifier(stub, timeout=(1, 0.3), retries=1, metrics=metrics)
+    start = time.perf_counter()
+    assert n.send("compra SPY")
+    assert time.perf_counter() - start < 0.05
+    n.close()
+    # El primer intent cau pel timeout de lectura i el reintent arriba
+    assert texts(stub) == ["*BOT*\ncompra SPY"]
+    assert stub.requests == 2
+    assert 'notifier_errors_total{kind="ReadTimeout"} 1' in metrics.render()
@@ -0,0 +1,17 @@
+import pytest
+
+from backtest import run_backtest, summarize
+from optimize import sample, GRIDS, sweep
+
+
+@pytest.mark.parametrize("strategy", ["balanced", "sniper"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_matches_backtest(bars, strategy, workers):
+    param_sets = sample(GRIDS[strategy], 6, seed=1)
+    table = sweep(bars, strategy, param_sets, workers)
+    assert len(table) == len(param_sets)
+    for row in table.to_dict('records'):
+        params = {k: row[k] for k in GRIDS[strategy]}
+        expected = summarize(run_backtest(bars, strategy, params), params)
+        for key, value in expected.items():
+            assert row[key] == pytest.approx(value, rel=1e-9, abs=1e-9), (params, key)
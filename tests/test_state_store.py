@@ -0,0 +1,27 @@
+import json
+
+from state_store import StateStore
+
+LEGACY = {
+    'balance': 1010.0, 'equity': 1010.0, 'wins': 1, 'losses': 1, 'portfolio': {},
+    'history': [{'Ticker': 'SPY', 'Res': 'WIN', 'PL': "+15.00$ (1.50%)"},
+                {'Ticker': 'BTC-USD', 'Res': 'LOSS', 'PL': "-5.00$ (-0.50%)"}],
+}
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "state.json"
+    legacy.write_text(json.dumps(LEGACY))
+    db = str(tmp_path / "state.db")
+
+    # Dos processos que arrenquen alhora: tots dos han vist la base de dades buida
+    first, second = StateStore(db), StateStore(db)
+    assert first.empty() and second.empty()
+    first._import_json(str(legacy))
+    second._import_json(str(legacy))
+    StateStore(db, legacy_json=str(legacy))
+
+    saved = StateStore(db).load(history_limit=-1)
+    assert [t['Ticker'] for t in saved['history']] == ['SPY', 'BTC-USD']
+    assert saved['balance'] == 1010.0
+    assert saved['stats']['total']['trades'] == 2